@@ -0,0 +1,111 @@
+import argparse
+from time import perf_counter
+from typing import NamedTuple
+
+import numpy as np
+
+from bitboard import WIN_MASKS, CELLS, FULL_MASK, cells_of
+
+# Batches of boards are (N, 9) int8 arrays in row-major cell order with these values
+# (the same digits as in the ternary_index of a board)
+EMPTY, X, O = 0, 1, 2
+
+# (8, 3) array with the cell indexes of the lines
+LINES = np.array([cells_of(mask) for mask in WIN_MASKS], dtype=np.intp)
+
+# the weights of the cells in the ternary_index of a board
+TERNARY_WEIGHTS = 3 ** np.arange(CELLS, dtype=np.intp)
+
+
+class BatchResult(NamedTuple):
+    winner: np.ndarray  # int8: 0 nobody, 1 X, 2 O
+    is_gameover: np.ndarray  # bool: someone won or the board is full
+    on_turn: np.ndarray  # int8: 1 X, 2 O (the player who would move next)
+
+
+def classify(boards: np.ndarray) -> BatchResult:
+    """
+    Classifies all the boards with line-mask reductions instead of a Python loop.
+    Like ComputerStrategyBuilder.gameover_state, X is reported as winner if both players have a line.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    lines = boards[:, LINES]  # (N, 8, 3)
+    x_wins = (lines == X).all(axis=2).any(axis=1)
+    o_wins = (lines == O).all(axis=2).any(axis=1)
+    winner = np.where(x_wins, X, np.where(o_wins, O, EMPTY)).astype(np.int8)
+    is_full = (boards != EMPTY).all(axis=1)
+    x_count = (boards == X).sum(axis=1)
+    o_count = (boards == O).sum(axis=1)
+    on_turn = np.where(x_count == o_count, X, O).astype(np.int8)
+    return BatchResult(winner, x_wins | o_wins | is_full, on_turn)
+
+
+def solve(strategy, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Looks up the solved value (the code of the Winner, see strategy.WINNER_CODES) and the depth of all the boards
+    in the tables of a ComputerStrategy.
+    """
+    indexes = np.asarray(boards, dtype=np.intp) @ TERNARY_WEIGHTS
+    values = np.frombuffer(strategy.values, dtype=np.uint8)
+    depths = np.frombuffer(strategy.depths, dtype=np.uint8)
+    return values[indexes], depths[indexes]
+
+
+def boards_from_keys(keys) -> np.ndarray:
+    """
+    Converts BitBoard keys to an (N, 9) board array.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    bits = np.arange(CELLS, dtype=np.int64)
+    x = (keys[:, None] & FULL_MASK) >> bits & 1
+    o = (keys[:, None] >> CELLS) >> bits & 1
+    return (x * X + o * O).astype(np.int8)
+
+
+def random_boards(count: int, seed: int = 0) -> np.ndarray:
+    """
+    Creates random positions that can happen in a game (the signs are placed alternately starting with X,
+    the game may have been continued after a win though).
+    """
+    rng = np.random.default_rng(seed)
+    orders = rng.permuted(np.tile(np.arange(CELLS), (count, 1)), axis=1)
+    lengths = rng.integers(0, CELLS + 1, size=count)
+    boards = np.zeros((count, CELLS), dtype=np.int8)
+    for move in range(CELLS):
+        placed = lengths > move
+        boards[placed, orders[placed, move]] = X if move % 2 == 0 else O
+    return boards
+
+
+def benchmark(count: int):
+    """
+    Compares classify() with classifying the boards one by one like the game does
+    (BitBoard construction and ComputerStrategyBuilder.gameover_state, both in the timed loop).
+    """
+    from bitboard import BitBoard
+    from strategy import ComputerStrategyBuilder
+
+    boards = random_boards(count)
+
+    started = perf_counter()
+    result = classify(boards)
+    vectorized = perf_counter() - started
+
+    bits = 1 << np.arange(CELLS, dtype=np.int64)
+    masks = list(zip(((boards == X) @ bits).tolist(), ((boards == O) @ bits).tolist()))
+    builder = ComputerStrategyBuilder()
+    started = perf_counter()
+    looped = [builder.gameover_state(BitBoard(x, o)).is_gameover for x, o in masks]
+    loop = perf_counter() - started
+
+    assert looped == result.is_gameover.tolist()
+    print(f"boards:              {count}")
+    print(f"classify:            {count / vectorized:,.0f} boards/s")
+    print(f"gameover_state loop: {count / loop:,.0f} boards/s")
+    print(f"speedup:             {loop / vectorized:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares batch classification with classifying the boards one by one.")
+    parser.add_argument("-n", "--count", type=int, default=1_000_000)
+    benchmark(parser.parse_args().count)
@@ -0,0 +1,183 @@
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+
+from game_engine import GameEngine, GameState
+from game_play_state import GamePlayState, GameTurn
+from strategy import ComputerStrategyBuilder, Difficulty
+
+
+class Metric(NamedTuple):
+    value: float
+    unit: str
+    higher_is_better: bool = False
+    noise: float = 0.0  # the relative difference between the median and the best sample
+
+
+def time_per_call(function: Callable[[], None], number: int = 1) -> float:
+    """
+    Runs the function number times and returns the average time of one call in seconds.
+    """
+    started = perf_counter()
+    for _ in range(number):
+        function()
+    return (perf_counter() - started) / number
+
+
+def bench_build(directory: Path) -> dict[str, Metric]:
+    builder = ComputerStrategyBuilder(str(directory / "benchmark.strategy"), use_symmetry=True)
+    return {"build_strategy.seconds": Metric(time_per_call(builder.build), "s")}
+
+
+def bench_build_memory() -> dict[str, Metric]:
+    # the peak memory doesn't vary, it is measured once (tracemalloc slows down the build a lot)
+    tracemalloc.start()
+    ComputerStrategyBuilder(use_symmetry=True).build_strategy()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"build_strategy.peak_memory": Metric(peak, "bytes")}
+
+
+def bench_load(number: int, directory: Path) -> dict[str, Metric]:
+    builder = ComputerStrategyBuilder(str(directory / "benchmark.strategy"))
+    return {"load.latency": Metric(time_per_call(builder.load, number) * 1e6, "us")}
+
+
+def bench_step(number: int, directory: Path) -> dict[str, Metric]:
+    strategy = ComputerStrategyBuilder(str(directory / "benchmark.strategy")).load()
+    state = GamePlayState(GameTurn.PLAYER)
+    state.add_sign_to((0, 0), "X")
+    board = state.board
+    metrics = {}
+    for difficulty in Difficulty:
+        seconds = time_per_call(lambda: strategy.step(board, "O", difficulty), number)
+        metrics[f"step.{difficulty.name}.latency"] = Metric(seconds * 1e6, "us")
+    return metrics
+
+
+def bench_is_gameover(number: int) -> dict[str, Metric]:
+    states = []
+    for moves in ([], [(1, 1), (0, 0), (0, 1)], [(0, 0), (1, 1), (0, 1), (2, 2), (0, 2)]):
+        state = GamePlayState(GameTurn.PLAYER)
+        for i, coord in enumerate(moves):
+            state.add_sign_to(coord, "X" if i % 2 == 0 else "O")
+        states.append(state)
+
+    def run():
+        for state in states:
+            state.is_gameover()
+    return {"is_gameover.throughput": Metric(len(states) / time_per_call(run, number), "calls/s", True)}
+
+
+def bench_player_chooses(games: int, directory: Path) -> dict[str, Metric]:
+    strategy = ComputerStrategyBuilder(str(directory / "benchmark.strategy")).load()
+    stage = {}
+    engine = GameEngine(lambda game_state: stage.update(current=game_state), strategy, think_time=0)
+    engine.connect_playing_state_change_handler(lambda state: None)
+    calls = 0
+    started = perf_counter()
+    for _ in range(games):
+        engine.launch()
+        engine.start_playing("X", Difficulty.HARD)
+        while stage["current"] == GameState.PLAYING:
+            free = next(coord for coord, sign in engine.playing_state.board.items() if sign is None)
+            engine.player_chooses(*free)
+            calls += 1
+        engine.restart()
+    return {"player_chooses.latency": Metric((perf_counter() - started) / calls * 1e6, "us")}
+
+
+def run_benchmarks(repeat: int, quick: bool) -> dict[str, Metric]:
+    """
+    Runs all the benchmarks repeat times in rounds and keeps the best sample of every metric.
+    The samples of a metric are taken in different rounds (seconds apart), so their spread (the noise of the metric)
+    also reflects the slower drifts of the machine's speed, not only the jitter of back-to-back runs.
+    Every sample of the fast operations runs many calls (number), so it takes at least some milliseconds
+    (a load of the strategy file takes about a hundred microseconds).
+    """
+    number = 5_000 if quick else 50_000
+    samples: dict[str, list[Metric]] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        for _ in range(repeat):
+            metrics = {} if samples else bench_build_memory()
+            metrics.update(bench_build(directory))
+            metrics.update(bench_load(number // 50, directory))
+            metrics.update(bench_step(number, directory))
+            metrics.update(bench_is_gameover(number))
+            metrics.update(bench_player_chooses(number // 100, directory))
+            for name, metric in metrics.items():
+                samples.setdefault(name, []).append(metric)
+
+    results = {}
+    for name, metric_samples in samples.items():
+        values = sorted((m.value for m in metric_samples), reverse=metric_samples[0].higher_is_better)
+        best, median = values[0], values[len(values) // 2]
+        noise = abs(median / best - 1) if best else 0.0
+        results[name] = metric_samples[0]._replace(value=best, noise=noise)
+    return results
+
+
+def compare(metrics: dict[str, Metric], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """
+    A metric is a regression if it got worse than the baseline by more than the threshold (ratio)
+    plus the noise of the noisier measurement, so a change within the noise of the samples is not reported.
+    :return: the names of the regressed metrics.
+    """
+    regressions = []
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["value"]
+        if not old:
+            continue
+        change = metric.value / old - 1
+        worse = -change if metric.higher_is_better else change
+        allowed = threshold + max(metric.noise, baseline[name].get("noise", 0.0))
+        status = "REGRESSION" if worse > allowed else "ok"
+        print(f"{name:28} {old:12.6g} -> {metric.value:12.6g} {metric.unit:8} {change:+7.1%} "
+              f"(allowed {allowed:.0%}) {status}")
+        if worse > allowed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the strategy build, load, moves and the game engine.")
+    parser.add_argument("-o", "--output", help="write the results as JSON into this file (default: stdout)")
+    parser.add_argument("-c", "--compare", help="baseline JSON file written by an earlier run")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2, help="allowed slowdown ratio (default: 0.2)")
+    parser.add_argument("-r", "--repeat", type=int, default=7, help="samples per metric (default: 7)")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations (for a fast check)")
+    args = parser.parse_args(argv)
+    if args.repeat < 3:
+        parser.error("at least 3 samples are needed to estimate the noise")
+
+    metrics = run_benchmarks(args.repeat, args.quick)
+    result = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "metrics": {name: metric._asdict() for name, metric in metrics.items()},
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["metrics"]
+        if regressions := compare(metrics, baseline, args.threshold):
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
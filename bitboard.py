@@ -0,0 +1,177 @@
+from typing import Optional
+
+X_SIGN = "X"
+O_SIGN = "O"
+
+SIZE = 3
+CELLS = SIZE * SIZE
+FULL_MASK = (1 << CELLS) - 1
+
+
+def _line_mask(indexes) -> int:
+    mask = 0
+    for i in indexes:
+        mask |= 1 << i
+    return mask
+
+
+WIN_MASKS: tuple[int, ...] = (
+    *(_line_mask(range(r * SIZE, (r + 1) * SIZE)) for r in range(SIZE)),  # rows
+    *(_line_mask(range(c, CELLS, SIZE)) for c in range(SIZE)),  # columns
+    _line_mask(range(0, CELLS, SIZE + 1)),  # diagonal
+    _line_mask(range(SIZE - 1, CELLS - 1, SIZE - 1)),  # anti-diagonal
+)
+
+# Lookup tables indexed by a 9-bit mask of one player's signs
+_IS_WINNING: tuple[bool, ...] = tuple(
+    any(mask & m == m for m in WIN_MASKS) for mask in range(FULL_MASK + 1))
+_MASK_CELLS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(i for i in range(CELLS) if mask >> i & 1) for mask in range(FULL_MASK + 1))
+
+
+def is_winning(mask: int) -> bool:
+    """
+    Tells whether the given 9-bit mask of one player's signs contains a full line.
+    """
+    return _IS_WINNING[mask]
+
+
+def cells_of(mask: int) -> tuple[int, ...]:
+    """
+    Returns the cell indexes (0..8, row-major) which are set in the given 9-bit mask.
+    """
+    return _MASK_CELLS[mask]
+
+
+class BitBoard:
+    """
+    A compact board representation. The signs of X and O are stored in two 9-bit integers
+    where bit i stands for the cell (i // 3, i % 3).
+    The key packs both integers into a single number (x | o << 9) which identifies the board.
+    """
+    def __init__(self, x: int = 0, o: int = 0):
+        self.x: int = x
+        self.o: int = o
+
+    @classmethod
+    def from_key(cls, key: int) -> "BitBoard":
+        return cls(key & FULL_MASK, key >> CELLS)
+
+    @property
+    def key(self) -> int:
+        return self.x | self.o << CELLS
+
+    def __eq__(self, other):
+        return isinstance(other, BitBoard) and self.x == other.x and self.o == other.o
+
+    def __hash__(self):
+        return self.key
+
+    def on_turn(self) -> str:
+        return X_SIGN if self.x.bit_count() == self.o.bit_count() else O_SIGN
+
+    def sign_at(self, index: int) -> Optional[str]:
+        bit = 1 << index
+        if self.x & bit:
+            return X_SIGN
+        if self.o & bit:
+            return O_SIGN
+        return None
+
+    def set_sign(self, index: int, sign: Optional[str]):
+        bit = 1 << index
+        self.x &= ~bit
+        self.o &= ~bit
+        if sign == X_SIGN:
+            self.x |= bit
+        elif sign == O_SIGN:
+            self.o |= bit
+
+    def with_sign(self, index: int, sign: str) -> "BitBoard":
+        bit = 1 << index
+        if sign == X_SIGN:
+            return BitBoard(self.x | bit, self.o)
+        return BitBoard(self.x, self.o | bit)
+
+    def empty_cells(self) -> tuple[int, ...]:
+        return _MASK_CELLS[FULL_MASK & ~(self.x | self.o)]
+
+    def winner(self) -> Optional[str]:
+        if _IS_WINNING[self.x]:
+            return X_SIGN
+        if _IS_WINNING[self.o]:
+            return O_SIGN
+        return None
+
+    def is_full(self) -> bool:
+        return self.x | self.o == FULL_MASK
+
+
+def _symmetry(transform) -> tuple[int, ...]:
+    """
+    Creates the cell permutation of a board symmetry. Item i of the result is the image of cell i.
+    """
+    return tuple(r * SIZE + c for (r, c) in (transform(*divmod(i, SIZE)) for i in range(CELLS)))
+
+
+# The 8 rotations/reflections of the board as cell permutations (the first one is the identity)
+SYMMETRIES: tuple[tuple[int, ...], ...] = tuple(_symmetry(t) for t in (
+    lambda r, c: (r, c),
+    lambda r, c: (c, SIZE - 1 - r),  # rotate 90
+    lambda r, c: (SIZE - 1 - r, SIZE - 1 - c),  # rotate 180
+    lambda r, c: (SIZE - 1 - c, r),  # rotate 270
+    lambda r, c: (r, SIZE - 1 - c),  # mirror vertically
+    lambda r, c: (SIZE - 1 - r, c),  # mirror horizontally
+    lambda r, c: (c, r),  # mirror on the diagonal
+    lambda r, c: (SIZE - 1 - c, SIZE - 1 - r),  # mirror on the anti-diagonal
+))
+
+# _SYMMETRY_MASKS[t][mask] is the image of a 9-bit mask under symmetry t
+_SYMMETRY_MASKS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(_line_mask(perm[i] for i in _MASK_CELLS[mask]) for mask in range(FULL_MASK + 1))
+    for perm in SYMMETRIES)
+
+
+def transform_key(key: int, symmetry: int) -> int:
+    """
+    Returns the key of the board transformed by the given symmetry (index into SYMMETRIES).
+    """
+    masks = _SYMMETRY_MASKS[symmetry]
+    return masks[key & FULL_MASK] | masks[key >> CELLS] << CELLS
+
+
+def canonical_key(key: int) -> int:
+    """
+    Returns the smallest key among the 8 rotations/reflections of the board.
+    Symmetric boards have the same canonical key.
+    """
+    x, o = key & FULL_MASK, key >> CELLS
+    return min(masks[x] | masks[o] << CELLS for masks in _SYMMETRY_MASKS)
+
+
+# Number of boards when every cell is either empty, X or O
+BOARD_COUNT = 3 ** CELLS
+
+_TERNARY: tuple[int, ...] = tuple(sum(3 ** i for i in _MASK_CELLS[mask]) for mask in range(FULL_MASK + 1))
+
+
+def ternary_index(key: int) -> int:
+    """
+    Returns the base-3 number of the board (0 is empty, 1 is X, 2 is O in every digit, cell 0 is the lowest digit).
+    The result is in range(BOARD_COUNT), so it can index a dense table of all boards.
+    """
+    return _TERNARY[key & FULL_MASK] + 2 * _TERNARY[key >> CELLS]
+
+
+def key_of_ternary_index(index: int) -> int:
+    """
+    The inverse of ternary_index: returns the key of the board with the given base-3 number.
+    """
+    x = o = 0
+    for i in range(CELLS):
+        index, digit = divmod(index, 3)
+        if digit == 1:
+            x |= 1 << i
+        elif digit == 2:
+            o |= 1 << i
+    return x | o << CELLS
@@ -1,14 +1,28 @@
+import asyncio
 from time import sleep
 from game_play_state import GamePlayState
 from strategy import Strategy, Difficulty
 
 
 class ComputerPlayer:
-    def __init__(self, strategy: Strategy, sign: str, difficulty: Difficulty):
+    def __init__(self, strategy: Strategy, sign: str, difficulty: Difficulty, think_time: float = 1 / 3):
         self.sign = sign
         self.strategy = strategy
         self.difficulty = difficulty
+        self.think_time = think_time
 
     def next_move(self, board: GamePlayState.GameBoard) -> tuple[int, int]:
-        sleep(1 / 3) # just for emulating the thinking of the computer
+        if self.think_time:
+            sleep(self.think_time)  # just for emulating the thinking of the computer
+        return self.strategy.step(board, self.sign, self.difficulty)
+
+
+class AsyncComputerPlayer(ComputerPlayer):
+    """
+    The asyncio variant of the ComputerPlayer. The thinking doesn't block the thread,
+    so one event loop can run many games at the same time.
+    """
+    async def next_move(self, board: GamePlayState.GameBoard) -> tuple[int, int]:
+        if self.think_time:
+            await asyncio.sleep(self.think_time)  # just for emulating the thinking of the computer
         return self.strategy.step(board, self.sign, self.difficulty)
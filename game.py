@@ -1,37 +1,147 @@
+from bitboard import SIZE
 from game_engine import GameEngine, GameState
 from game_play_state import GamePlayState, GameTurn
 from tkinter import Tk, Frame, Label, Button, Radiobutton, PhotoImage, StringVar, NORMAL, DISABLED, CENTER, IntVar
+from collections.abc import Callable
+from typing import NamedTuple, Optional
+import logging
+import queue
 import threading
 from strategy import Strategy, Difficulty
 
+logger = logging.getLogger(__name__)
+
+
+class PlayingSnapshot(NamedTuple):
+    """
+    An immutable copy of the playing state (the signs of the cells in row-major order and the player on turn).
+    It is taken on the engine's thread when the engine notifies the GUI, so the Tk thread draws exactly
+    the state of the notification it handles and never reads the engine while the worker changes it.
+    """
+    cells: tuple[Optional[str], ...]
+    turn: GameTurn
+
+    @classmethod
+    def of(cls, state: GamePlayState) -> "PlayingSnapshot":
+        return cls(tuple(item for _, item in state.board.items()), state.turn)
+
+
+class GameOverSnapshot(NamedTuple):
+    """
+    An immutable copy of the gameover state of the engine (the final board and the sign of the winner or None).
+    """
+    board: tuple[tuple[tuple[int, int], Optional[str]], ...]
+    winner: Optional[str]
+
+    @classmethod
+    def of(cls, gameover_state: dict) -> "GameOverSnapshot":
+        return cls(tuple(gameover_state["board"]), gameover_state["winner"])
+
+
+class EngineWorker:
+    """
+    A long-lived thread that executes the commands (e.g. calls to the GameEngine) one by one in the order of submission.
+    The GUI submits the user's actions here, so the slow engine calls (the computer's thinking)
+    don't block the Tk main loop and no thread is created per user action.
+    """
+    def __init__(self):
+        self.commands: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="engine-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, command: Callable, *args):
+        self.commands.put((command, args))
+
+    def stop(self):
+        self.commands.put(None)
+
+    def run(self):
+        while (item := self.commands.get()) is not None:
+            command, args = item
+            try:
+                command(*args)
+            except Exception:
+                logger.exception("Engine command failed")
+
 
 class Game(Tk):
     """
     It's a subclass of Tkinter.Tk enabling the creation of GUI elements.
     This class scaffold for the game stages (Start, Playing, GameOver).
-    It handles the game state changes coming from the GameEngine by instantiating
+    It handles the game state changes coming from the GameEngine by showing
     the appropriate nested GUI class for the current stage.
+    The images and the stages are created only once and the stages are reused (shown and hidden) on the changes.
+
+    The engine is only called from the EngineWorker thread. Tk must only be used from the main thread,
+    so the engine's notifications are posted to a queue which is processed by the Tk main loop (scheduled with after()).
+    Every notification carries a snapshot of the engine's state (see PlayingSnapshot and GameOverSnapshot),
+    the stages draw the snapshots and never read the engine on the main thread.
     """
+    ui_poll_interval = 15  # ms
+
     def __init__(self, computer_strategy: Strategy):
         super().__init__()
-        self.game_engine = GameEngine(self.gamestate_change_handler, computer_strategy)
+        self.worker = EngineWorker()
+        self.ui_updates: queue.Queue = queue.Queue()
+        self.game_engine = GameEngine(self.on_gamestate_change, computer_strategy)
         self.title("Tic tac toe")
         self.geometry("250x320")
+        self.images = {
+            "CIRCLE": PhotoImage(file=r"images\circle.png", width=64, height=64),
+            "CROSS": PhotoImage(file=r"images\cross.png", width=64, height=64),
+            "EMPTY": PhotoImage(file=r"images\empty.png", width=64, height=64)
+        }
+        self.stages = {
+            GameState.START: Game.Start(self, self.game_engine),
+            GameState.PLAYING: Game.Playing(self, self.game_engine),
+            GameState.GAMEOVER: Game.GameOver(self, self.game_engine),
+        }
+        self.current_stage = None
 
-    def gamestate_change_handler(self, game_state: GameState):
-        for child in self.winfo_children():
-            child.destroy()
-
-        if game_state == GameState.START:
-            Game.Start(self, self.game_engine)
+    def on_gamestate_change(self, game_state: GameState):
+        """
+        Called by the engine on the worker thread: the state of the new stage is copied and posted to the main thread.
+        """
         if game_state == GameState.PLAYING:
-            Game.Playing(self, self.game_engine)
-        if game_state == GameState.GAMEOVER:
-            Game.GameOver(self, self.game_engine)
+            snapshot = PlayingSnapshot.of(self.game_engine.playing_state)
+        elif game_state == GameState.GAMEOVER:
+            snapshot = GameOverSnapshot.of(self.game_engine.gameover_state)
+        else:
+            snapshot = None
+        self.post(self.gamestate_change_handler, game_state, snapshot)
+
+    def gamestate_change_handler(self, game_state: GameState, snapshot=None):
+        if self.current_stage:
+            self.current_stage.hide()
+        self.current_stage = self.stages[game_state]
+        self.current_stage.show(snapshot)
+
+    def post(self, callback: Callable, *args):
+        """
+        Schedules the callback on the Tk main thread. It can be called from any thread.
+        """
+        self.ui_updates.put((callback, args))
+
+    def process_ui_updates(self):
+        while True:
+            try:
+                callback, args = self.ui_updates.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        self.after(self.ui_poll_interval, self.process_ui_updates)
 
     def launch(self):
-        self.game_engine.launch()
-        self.mainloop()
+        self.worker.submit(self.game_engine.launch)
+        self.process_ui_updates()
+        try:
+            self.mainloop()
+        finally:
+            self.worker.stop()
+
+    @staticmethod
+    def image_name(item) -> str:
+        return "CROSS" if item == "X" else "CIRCLE" if item == "O" else "EMPTY"
 
     class Playing:
         """
@@ -39,6 +149,7 @@ class Game(Tk):
         It sends the moves of the user to the GameEngine and updates the UI based on game state changes
         with the help of the playing_state_changed callback method.
         The class creates a grid of buttons and text indicating the player on turn.
+        Only the buttons whose image or state changed are reconfigured on an update.
         """
 
         turn_indicator_config = {
@@ -49,43 +160,41 @@ class Game(Tk):
         def __init__(self, tk_root, engine: GameEngine):
             self.tk_root = tk_root
             self.engine = engine
-            self.engine.connect_playing_state_change_handler(self.playing_state_changed)
+            self.engine.connect_playing_state_change_handler(
+                lambda state: tk_root.post(self.playing_state_changed, PlayingSnapshot.of(state)))
             self.playfield_buttons = {}
+            self.button_configs = {}
+            self.is_player_on_turn = None
             self.indexes = [(r, c) for r in range(3) for c in range(3)]
-            self.images = {}
+            self.frame = None
             self.playfield = None
             self.on_turn_text_field = None
             self.setup_controls()
             self.layout_controls()
 
         def setup_controls(self):
-            self.images = {
-                "CIRCLE": PhotoImage(file=r"images\circle.png", width=64, height=64),
-                "CROSS": PhotoImage(file=r"images\cross.png", width=64, height=64),
-                "EMPTY": PhotoImage(file=r"images\empty.png", width=64, height=64)
-            }
-            state = self.engine.playing_state
-            is_player_on_turn = state.turn is GameTurn.PLAYER
-            btn_state = NORMAL if is_player_on_turn else DISABLED
-
-            self.playfield = Frame(self.tk_root)
+            self.frame = Frame(self.tk_root)
+            self.playfield = Frame(self.frame)
             for r, c in self.indexes:
                 btn = Button(self.playfield,
-                             image=self.images["EMPTY"],
-                             state=btn_state,
+                             image=self.tk_root.images["EMPTY"],
+                             state=DISABLED,
                              command=self.create_button_command(r, c))
                 self.playfield_buttons[(r, c)] = btn
 
-            on_turn_config = self.turn_indicator_config["player" if is_player_on_turn else "computer"]
-            self.on_turn_text_field = Label(self.tk_root, **on_turn_config)
+            self.on_turn_text_field = Label(self.frame, **self.turn_indicator_config["computer"])
 
         def create_button_command(self, r, c):
             def command():
-                print("Player Chooses", r, c)
+                # Runs on the worker: clicks queued during the computer's turn or after the game is over are dropped
+                state = self.engine.playing_state
+                if state is None or self.engine.gameover_state is not None \
+                        or state.turn is not GameTurn.PLAYER or state.board[(r, c)] is not None:
+                    return
+                logger.debug("Player chooses %s %s", r, c)
                 self.engine.player_chooses(r, c)
 
-            t = threading.Thread(target=command)
-            return lambda: t.start()
+            return lambda: self.tk_root.worker.submit(command)
 
         def layout_controls(self):
             for key, btn in self.playfield_buttons.items():
@@ -95,17 +204,30 @@ class Game(Tk):
             self.playfield.pack(padx=20, pady=20)
             self.on_turn_text_field.pack(ipadx=3, ipady=3)
 
-        def playing_state_changed(self, state: GamePlayState):
-            print("New State:", str(state))
+        def show(self, state: PlayingSnapshot):
+            self.button_configs = {}  # the buttons are configured from scratch for the new game
+            self.is_player_on_turn = None
+            self.playing_state_changed(state)
+            self.frame.pack()
+
+        def hide(self):
+            self.frame.pack_forget()
+
+        def playing_state_changed(self, state: PlayingSnapshot):
+            logger.debug("New state: %s", state)
             is_player_on_turn = state.turn is GameTurn.PLAYER
-            on_turn_config = self.turn_indicator_config["player" if is_player_on_turn else "computer"]
-            self.on_turn_text_field.config(**on_turn_config)
+            if is_player_on_turn != self.is_player_on_turn:
+                self.is_player_on_turn = is_player_on_turn
+                on_turn_config = self.turn_indicator_config["player" if is_player_on_turn else "computer"]
+                self.on_turn_text_field.config(**on_turn_config)
             for key, btn in self.playfield_buttons.items():
-                item = state.board[key]
+                item = state.cells[key[0] * SIZE + key[1]]
                 is_btn_clickable = is_player_on_turn and item is None
-                btn_state = NORMAL if is_btn_clickable else DISABLED
-                btn_image = "CROSS" if item == "X" else "CIRCLE" if item == "O" else "EMPTY"
-                btn.config(image=self.images[btn_image], state=btn_state)
+                btn_config = (Game.image_name(item), NORMAL if is_btn_clickable else DISABLED)
+                if self.button_configs.get(key) != btn_config:
+                    self.button_configs[key] = btn_config
+                    btn_image, btn_state = btn_config
+                    btn.config(image=self.tk_root.images[btn_image], state=btn_state)
 
     class Start:
         """
@@ -146,16 +268,17 @@ class Game(Tk):
                                             command=self.create_start_button_command())
 
         def create_start_button_command(self):
-            def start():
-                player_sign = self.player_sign_tkvar.get()
-                difficulty = Difficulty(self.difficulty_tkvar.get())
-                self.engine.start_playing(player_sign, difficulty)
+            def start(player_sign: str, difficulty: Difficulty):
+                if self.engine.playing_state is None:  # a second click must not restart the game
+                    self.engine.start_playing(player_sign, difficulty)
 
-            thread = threading.Thread(target=start)
-            return thread.start
+            def command():
+                # the Tk variables are read on the main thread
+                self.tk_root.worker.submit(start, self.player_sign_tkvar.get(), Difficulty(self.difficulty_tkvar.get()))
+
+            return command
 
         def layout_controls(self):
-            self.frame.place(anchor=CENTER, relx=0.5, rely=0.5)
             self.welcome_label.pack()
             self.sign_chooser_buttons[0].pack(pady=(5, 0))
             self.sign_chooser_buttons[1].pack(pady=(0, 5))
@@ -166,6 +289,12 @@ class Game(Tk):
             self.difficulty_chooser_buttons[2].pack(pady=(0, 15))
             self.game_start_button.pack()
 
+        def show(self, snapshot=None):
+            self.frame.place(anchor=CENTER, relx=0.5, rely=0.5)
+
+        def hide(self):
+            self.frame.place_forget()
+
     class GameOver:
         """
         This class represents the GUI for the game over stage. It creates a grid of buttons with the last board state,
@@ -175,7 +304,7 @@ class Game(Tk):
         def __init__(self, tk_root, engine: GameEngine):
             self.game_over_label = None
             self.tk_root = tk_root
-            self.images = {}
+            self.frame = None
             self.playfield = None
             self.playfield_buttons = {}
             self.restart_button = None
@@ -184,25 +313,19 @@ class Game(Tk):
             self.layout_controls()
 
         def setup_controls(self):
-            self.images = {
-                "CIRCLE": PhotoImage(file=r"images\circle.png", width=64, height=64),
-                "CROSS": PhotoImage(file=r"images\cross.png", width=64, height=64),
-                "EMPTY": PhotoImage(file=r"images\empty.png", width=64, height=64)
-            }
+            self.frame = Frame(self.tk_root)
+            self.playfield = Frame(self.frame)
 
-            self.playfield = Frame(self.tk_root)
-
-            for ((r, c), item) in self.engine.gameover_state["board"]:
-                btn_image = "CROSS" if item == "X" else "CIRCLE" if item == "O" else "EMPTY"
-                btn = Button(self.playfield,
-                             image=self.images[btn_image],
-                             state=DISABLED,
-                             command=self.none_command)  # somehow tkinter button breaks without a command
-                self.playfield_buttons[(r, c)] = btn
-            winner_sign = self.engine.gameover_state["winner"]
-            game_over_text = f"Game over. {winner_sign} wins." if winner_sign else "Game over. It's a tie."
-            self.game_over_label = Label(self.tk_root, font=("Courier", "12", "bold"), text=game_over_text)
-            self.restart_button = Button(self.tk_root, text="Restart", command=self.engine.restart)
+            for r in range(3):
+                for c in range(3):
+                    btn = Button(self.playfield,
+                                 image=self.tk_root.images["EMPTY"],
+                                 state=DISABLED,
+                                 command=self.none_command)  # somehow tkinter button breaks without a command
+                    self.playfield_buttons[(r, c)] = btn
+            self.game_over_label = Label(self.frame, font=("Courier", "12", "bold"))
+            self.restart_button = Button(self.frame, text="Restart",
+                                         command=lambda: self.tk_root.worker.submit(self.engine.restart))
 
         def none_command(self):
             ...
@@ -215,3 +338,14 @@ class Game(Tk):
 
             self.game_over_label.pack(ipadx=3, ipady=3)
             self.restart_button.pack()
+
+        def show(self, gameover_state: GameOverSnapshot):
+            for ((r, c), item) in gameover_state.board:
+                self.playfield_buttons[(r, c)].config(image=self.tk_root.images[Game.image_name(item)])
+            winner_sign = gameover_state.winner
+            game_over_text = f"Game over. {winner_sign} wins." if winner_sign else "Game over. It's a tie."
+            self.game_over_label.config(text=game_over_text)
+            self.frame.pack()
+
+        def hide(self):
+            self.frame.pack_forget()
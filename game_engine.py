@@ -1,8 +1,10 @@
+import inspect
 from enum import Enum
-from collections.abc import Callable
-from typing import Optional
+from collections.abc import Awaitable, Callable
+from typing import Optional, Union
 
-from computer_player import ComputerPlayer
+from computer_player import ComputerPlayer, AsyncComputerPlayer
+from game_record import GameRecorder
 from game_play_state import GamePlayState, GameTurn
 from strategy import Strategy, Difficulty
 
@@ -21,9 +23,14 @@ class GameEngine:
     The other is the playing_state_listener. This can be registered using the connect_playing_state_change_handler method.
     The playing_state_listener callback function is only used in the Playing stage. This will be called on
     every game state change (e.g. Player or opponent did a move).
+    If a GameRecorder is given, the games (start, moves, result) are recorded with it.
     """
-    def __init__(self, gamestate_listener: Callable[[GameState], None], computer_strategy: Strategy):
+    def __init__(self, gamestate_listener: Callable[[GameState], None], computer_strategy: Strategy,
+                 think_time: float = 1 / 3, recorder: Optional[GameRecorder] = None):
         self.computer_strategy = computer_strategy
+        self.think_time = think_time
+        self.recorder = recorder
+        self.recorded_game_id: Optional[int] = None
         self.playing_state_listener = None
         self.player_sign = None
         self.listener = gamestate_listener
@@ -37,23 +44,36 @@ class GameEngine:
     def start_playing(self, player_sign: str, difficulty: Difficulty):
         self.player_sign = player_sign
         computer_player_sign = "O" if player_sign == "X" else "X"
-        self.computer_player = ComputerPlayer(self.computer_strategy, computer_player_sign, difficulty)
+        self.computer_player = ComputerPlayer(self.computer_strategy, computer_player_sign, difficulty, self.think_time)
         self.playing_state = GamePlayState(GameTurn.PLAYER if player_sign == "X" else GameTurn.COMPUTER)
+        if self.recorder:
+            self.recorded_game_id = self.recorder.start_game(difficulty.value, player_sign)
         self.listener(GameState.PLAYING)
 
         if self.playing_state.turn == GameTurn.COMPUTER:
             (c_r, c_c) = self.computer_player.next_move(self.playing_state.board)
-            self.playing_state.add_sign_to((c_r, c_c), self.computer_player.sign)
+            self.add_sign_to((c_r, c_c), self.computer_player.sign)
             self.playing_state.change_turn(GameTurn.PLAYER)
             self.playing_state_listener(self.playing_state)
 
+    def add_sign_to(self, coord: tuple[int, int], sign: str):
+        self.playing_state.add_sign_to(coord, sign)
+        if self.recorder:
+            self.recorder.record_move(self.recorded_game_id, coord, sign)
+
+    def finish_game(self, winner_sign: Union[bool, str]):
+        winner = winner_sign if winner_sign is not True else None
+        self.gameover_state = {"board": self.playing_state.board.items(), "winner": winner}
+        if self.recorder:
+            self.recorder.end_game(self.recorded_game_id, winner)
+            self.recorded_game_id = None
+        self.listener(GameState.GAMEOVER)
+
     def player_chooses(self, r, c):
         # Receive players move
-        self.playing_state.add_sign_to((r, c), self.player_sign)
+        self.add_sign_to((r, c), self.player_sign)
         if winner_sign := self.playing_state.is_gameover():
-            winner = winner_sign if winner_sign is not True else None
-            self.gameover_state = {"board": self.playing_state.board.items(), "winner": winner}
-            self.listener(GameState.GAMEOVER)
+            self.finish_game(winner_sign)
             return
         else:
             self.playing_state_listener(self.playing_state)
@@ -64,10 +84,9 @@ class GameEngine:
 
         # Receive computers move and change active player to player
         (c_r, c_c) = self.computer_player.next_move(self.playing_state.board)
-        self.playing_state.add_sign_to((c_r, c_c), self.computer_player.sign)
+        self.add_sign_to((c_r, c_c), self.computer_player.sign)
         if winner_sign := self.playing_state.is_gameover():
-            self.gameover_state = {"board": self.playing_state.board.items(), "winner": winner_sign}
-            self.listener(GameState.GAMEOVER)
+            self.finish_game(winner_sign)
             return
         else:
             self.playing_state.change_turn(GameTurn.PLAYER)
@@ -77,6 +96,86 @@ class GameEngine:
         self.playing_state_listener = playing_state_listener
 
     def restart(self):
+        if self.recorder and self.recorded_game_id is not None:
+            self.recorder.abandon_game(self.recorded_game_id)
+            self.recorded_game_id = None
         self.playing_state = None
         self.gameover_state = None
         self.listener(GameState.START)
+
+
+class AsyncGameEngine:
+    """
+    The asyncio variant of the GameEngine. The methods driving the engine are coroutines
+    and the computer player thinks with a non-blocking sleep (think_time can also be 0).
+    The listeners can be plain functions or coroutine functions.
+    """
+    def __init__(self, gamestate_listener: Callable[[GameState], Union[None, Awaitable[None]]],
+                 computer_strategy: Strategy, think_time: float = 1 / 3):
+        self.computer_strategy = computer_strategy
+        self.think_time = think_time
+        self.playing_state_listener = None
+        self.player_sign = None
+        self.listener = gamestate_listener
+        self.playing_state: Optional[GamePlayState] = None
+        self.gameover_state = None
+        self.computer_player: Optional[AsyncComputerPlayer] = None
+
+    @staticmethod
+    async def notify(listener: Callable, *args):
+        result = listener(*args)
+        if inspect.isawaitable(result):
+            await result
+
+    async def launch(self):
+        await self.notify(self.listener, GameState.START)
+
+    async def start_playing(self, player_sign: str, difficulty: Difficulty):
+        self.player_sign = player_sign
+        computer_player_sign = "O" if player_sign == "X" else "X"
+        self.computer_player = AsyncComputerPlayer(self.computer_strategy, computer_player_sign, difficulty,
+                                                   self.think_time)
+        self.playing_state = GamePlayState(GameTurn.PLAYER if player_sign == "X" else GameTurn.COMPUTER)
+        await self.notify(self.listener, GameState.PLAYING)
+
+        if self.playing_state.turn == GameTurn.COMPUTER:
+            await self.computer_moves()
+
+    async def player_chooses(self, r, c):
+        # Receive players move
+        self.playing_state.add_sign_to((r, c), self.player_sign)
+        if await self.check_gameover():
+            return
+        await self.notify(self.playing_state_listener, self.playing_state)
+
+        # Change active player to computer
+        self.playing_state.change_turn(GameTurn.COMPUTER)
+        await self.notify(self.playing_state_listener, self.playing_state)
+
+        await self.computer_moves()
+
+    async def computer_moves(self):
+        # Receive computers move and change active player to player
+        (c_r, c_c) = await self.computer_player.next_move(self.playing_state.board)
+        self.playing_state.add_sign_to((c_r, c_c), self.computer_player.sign)
+        if await self.check_gameover():
+            return
+        self.playing_state.change_turn(GameTurn.PLAYER)
+        await self.notify(self.playing_state_listener, self.playing_state)
+
+    async def check_gameover(self) -> bool:
+        if winner_sign := self.playing_state.is_gameover():
+            winner = winner_sign if winner_sign is not True else None
+            self.gameover_state = {"board": self.playing_state.board.items(), "winner": winner}
+            await self.notify(self.listener, GameState.GAMEOVER)
+            return True
+        return False
+
+    def connect_playing_state_change_handler(
+            self, playing_state_listener: Callable[[GamePlayState], Union[None, Awaitable[None]]]):
+        self.playing_state_listener = playing_state_listener
+
+    async def restart(self):
+        self.playing_state = None
+        self.gameover_state = None
+        await self.notify(self.listener, GameState.START)
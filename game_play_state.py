@@ -1,6 +1,7 @@
 from enum import Enum
-import itertools
-from typing import Union
+from typing import Optional, Union
+
+from bitboard import BitBoard, SIZE, CELLS, X_SIGN, is_winning
 
 
 class GameTurn(Enum):
@@ -9,9 +10,17 @@ class GameTurn(Enum):
 
 
 class GamePlayState:
+    """
+    The state of a game: the board and the player on turn.
+    The moves must be made with add_sign_to (and can be taken back with undo), so the state can keep track of
+    the winner and the number of empty cells, and is_gameover costs constant time.
+    """
     def __init__(self, game_turn: GameTurn):
         self.turn: GameTurn = game_turn
         self.board: GamePlayState.GameBoard = GamePlayState.GameBoard()
+        self.winner: Optional[str] = None
+        self.empty_count: int = CELLS
+        self.moves: list[tuple[int, Optional[str]]] = []  # (cell index, winner before the move)
 
     def __str__(self):
         return """\n-------
@@ -22,12 +31,29 @@ BOARD:
         """.format(self.turn, self.board)
 
     def add_sign_to(self, coord: tuple[int, int], player_sign):
-        self.board[coord] = player_sign
-
-    class GameBoard:
-        def __init__(self):
-            self.board = [[None, None, None], [None, None, None], [None, None, None]]
-
+        index = coord[0] * SIZE + coord[1]
+        board = self.board
+        board.set_sign(index, player_sign)
+        self.moves.append((index, self.winner))
+        self.empty_count -= 1
+        # Only the lines through the new sign can be completed by the move. The masks of the player's signs
+        # are looked up in a precomputed table, which covers all the lines at once.
+        if self.winner is None and is_winning(board.x if player_sign == X_SIGN else board.o):
+            self.winner = player_sign
+
+    def undo(self):
+        """
+        Takes back the last move. It lets the search based strategies make and unmake moves on one state.
+        """
+        index, self.winner = self.moves.pop()
+        self.board.set_sign(index, None)
+        self.empty_count += 1
+
+    class GameBoard(BitBoard):
+        """
+        The board of the game addressed by (row, column) coordinates.
+        It is a BitBoard, so the strategies can work with it directly without any conversion.
+        """
         def __str__(self):
             def to_char(f):
                 return f if f is not None else "-"
@@ -41,55 +67,16 @@ BOARD:
 -------"
 
         def __getitem__(self, key: tuple[int, int]):
-            return self.board[key[0]][key[1]]
+            return self.sign_at(key[0] * SIZE + key[1])
 
         def __setitem__(self, key: tuple[int, int], value):
-            self.board[key[0]][key[1]] = value
+            self.set_sign(key[0] * SIZE + key[1], value)
 
         def items(self):
-            return [((r, c), self.board[r][c]) for r in range(3) for c in range(3)]
-
-        def is_full(self):
-            return all(itertools.chain(*self.board))
+            return [((r, c), self[(r, c)]) for r in range(SIZE) for c in range(SIZE)]
 
     def change_turn(self, turn: GameTurn):
         self.turn = turn
 
     def is_gameover(self) -> Union[bool, str]:
-        def does_someone_win() -> Union[bool, str]:
-            def signs_in_a_row():
-                is_row1 = self.board[(0, 0)] == self.board[(0, 1)] \
-                          and self.board[(0, 1)] == self.board[(0, 2)] \
-                          and self.board[(0, 0)]  # Not all is None
-                is_row2 = self.board[(1, 0)] == self.board[(1, 1)] \
-                          and self.board[(1, 1)] == self.board[(1, 2)] \
-                          and self.board[(1, 1)]  # Not all is None
-                is_row3 = self.board[(2, 0)] == self.board[(2, 1)] \
-                          and self.board[(2, 1)] == self.board[(2, 2)] \
-                          and self.board[(2, 2)]  # Not all is None
-                return is_row1 or is_row2 or is_row3
-
-            def signs_in_a_column():
-                is_col1 = self.board[(0, 0)] == self.board[(1, 0)] \
-                          and self.board[(1, 0)] == self.board[(2, 0)] \
-                          and self.board[(0, 0)]  # Not all is None
-                is_col2 = self.board[(0, 1)] == self.board[(1, 1)] \
-                          and self.board[(1, 1)] == self.board[(2, 1)] \
-                          and self.board[(1, 1)]  # Not all is None
-                is_col3 = self.board[(0, 2)] == self.board[(1, 2)] \
-                          and self.board[(1, 2)] == self.board[(2, 2)] \
-                          and self.board[(2, 2)]  # Not all is None
-                return is_col1 or is_col2 or is_col3
-
-            def signs_in_a_diagonal():
-                is_d1 = self.board[(0, 0)] == self.board[(1, 1)] \
-                        and self.board[(1, 1)] == self.board[(2, 2)] \
-                        and self.board[(1, 1)]  # Not all is None
-                is_d2 = self.board[(0, 2)] == self.board[(1, 1)] \
-                        and self.board[(1, 1)] == self.board[(2, 0)] \
-                        and self.board[(1, 1)]  # Not all is None
-                return is_d1 or is_d2
-
-            return signs_in_a_row() or signs_in_a_column() or signs_in_a_diagonal()
-
-        return does_someone_win() or self.board.is_full()
+        return self.winner or self.empty_count == 0
@@ -0,0 +1,189 @@
+import argparse
+import struct
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from pathlib import Path
+from time import time
+from typing import NamedTuple, Optional
+
+from bitboard import SIZE, X_SIGN, O_SIGN
+from strategy import Difficulty
+
+MAGIC = b"TTTL"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sH")
+
+# kind, game id, timestamp, value1, value2
+RECORD = struct.Struct("<BIdBB")
+GAME_START, MOVE, GAME_END = range(3)
+
+SIGNS = (None, X_SIGN, O_SIGN)  # signs are stored by their index in this tuple (None is a tie for the result)
+ABANDONED = 3  # result of a game that was restarted before it was over
+RESULT_NAMES = {0: "tie", 1: X_SIGN, 2: O_SIGN, ABANDONED: "abandoned"}
+
+
+class Record(NamedTuple):
+    """
+    One record of the log. The meaning of value1 and value2 depends on the kind:
+      GAME_START: difficulty, sign of the player
+      MOVE:       cell index (row * 3 + column), sign
+      GAME_END:   result (sign of the winner, 0 for a tie, ABANDONED), -
+    """
+    kind: int
+    game_id: int
+    timestamp: float
+    value1: int
+    value2: int
+
+
+class GameRecorder:
+    """
+    Appends the records of the games into a binary log file through a large buffer,
+    so recording costs a struct.pack per move. Every record has a fixed size.
+    An existing log is continued: a partially written record at its end (left by a crashed process) is cut off,
+    and the game ids continue after the last game of the log.
+    The game ids are unique within a file as long as only one recorder writes it at a time,
+    so every process should write its own file.
+    """
+    def __init__(self, path: Path, buffer_size: int = 1 << 16):
+        self.path = Path(path)
+        self.next_game_id = self.repair(self.path)
+        self.file = open(self.path, "ab", buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def repair(path: Path, chunk_records: int = 4096) -> int:
+        """
+        Validates the header of an existing log and truncates it to whole records.
+        :return: the id of the next game (one more than the id of the last started game in the log)
+        :raises ValueError: if the file is not a game record log
+        """
+        if not path.exists() or path.stat().st_size == 0:
+            return 0
+        with open(path, "r+b") as f:
+            header = f.read(FILE_HEADER.size)
+            expected = FILE_HEADER.pack(MAGIC, VERSION)
+            if len(header) < FILE_HEADER.size and expected.startswith(header):
+                f.truncate(0)  # the header itself was torn, the log is started again
+                return 0
+            if header != expected:
+                raise ValueError(f"{path} is not a game record log")
+            records = (f.seek(0, 2) - FILE_HEADER.size) // RECORD.size
+            f.truncate(FILE_HEADER.size + records * RECORD.size)
+            # the ids are given in increasing order, so the last chunk with a GAME_START has the largest id
+            end = records
+            while end > 0:
+                start = max(0, end - chunk_records)
+                f.seek(FILE_HEADER.size + start * RECORD.size)
+                chunk = f.read((end - start) * RECORD.size)
+                started = [game_id for kind, game_id, *_ in RECORD.iter_unpack(chunk) if kind == GAME_START]
+                if started:
+                    return max(started) + 1
+                end = start
+        return 0
+
+    def write(self, kind: int, game_id: int, value1: int = 0, value2: int = 0):
+        with self.lock:
+            self.file.write(RECORD.pack(kind, game_id, time(), value1, value2))
+
+    def start_game(self, difficulty: int, player_sign: str) -> int:
+        with self.lock:
+            game_id = self.next_game_id
+            self.next_game_id += 1
+        self.write(GAME_START, game_id, difficulty, SIGNS.index(player_sign))
+        return game_id
+
+    def record_move(self, game_id: int, coord: tuple[int, int], sign: str):
+        self.write(MOVE, game_id, coord[0] * SIZE + coord[1], SIGNS.index(sign))
+
+    def end_game(self, game_id: int, winner: Optional[str]):
+        self.write(GAME_END, game_id, SIGNS.index(winner))
+
+    def abandon_game(self, game_id: int):
+        self.write(GAME_END, game_id, ABANDONED)
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_records(path: Path, chunk_records: int = 4096) -> Iterator[Record]:
+    """
+    Streams the records of the log. Only one chunk of the file is held in memory.
+    A partially written record at the end of the file is ignored.
+    """
+    with open(path, "rb") as f:
+        header = f.read(FILE_HEADER.size)
+        magic, version = FILE_HEADER.unpack(header) if len(header) == FILE_HEADER.size else (None, None)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a game record log")
+        while chunk := f.read(RECORD.size * chunk_records):
+            usable = len(chunk) - len(chunk) % RECORD.size
+            for record in RECORD.iter_unpack(chunk[:usable]):
+                yield Record(*record)
+
+
+class GameSummary(NamedTuple):
+    game_id: int
+    started: float
+    difficulty: int
+    player_sign: str
+    moves: list[tuple[int, str]]  # (cell index, sign)
+    result: int
+
+
+def read_games(path: Path) -> Iterator[GameSummary]:
+    """
+    Streams the finished games of the log. Only the games in progress are kept in memory.
+    """
+    in_progress: dict[int, GameSummary] = {}
+    for kind, game_id, timestamp, value1, value2 in read_records(path):
+        if kind == GAME_START:
+            in_progress[game_id] = GameSummary(game_id, timestamp, value1, SIGNS[value2], [], 0)
+        elif kind == MOVE:
+            if game := in_progress.get(game_id):
+                game.moves.append((value1, SIGNS[value2]))
+        elif kind == GAME_END:
+            if game := in_progress.pop(game_id, None):
+                yield game._replace(result=value1)
+
+
+def aggregate(path: Path) -> dict:
+    """
+    Computes the result rates per difficulty and the most popular openings in one pass over the log.
+    """
+    results: dict[int, Counter] = {}
+    openings: Counter = Counter()
+    for game in read_games(path):
+        results.setdefault(game.difficulty, Counter())[RESULT_NAMES[game.result]] += 1
+        if game.moves:
+            openings[divmod(game.moves[0][0], SIZE)] += 1
+    return {
+        "results_by_difficulty": {
+            difficulty: {name: count / sum(counts.values()) for name, count in counts.items()}
+            for difficulty, counts in sorted(results.items())
+        },
+        "openings": openings.most_common(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prints statistics of a game record log.")
+    parser.add_argument("log", type=Path)
+    args = parser.parse_args(argv)
+    stats = aggregate(args.log)
+    for difficulty, rates in stats["results_by_difficulty"].items():
+        print(f"{Difficulty(difficulty).name}: " + ", ".join(f"{name} {rate:.1%}" for name, rate in sorted(rates.items())))
+    for (r, c), count in stats["openings"][:5]:
+        print(f"opening ({r}, {c}): {count} games")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+from time import perf_counter
+
+
+class Client:
+    """
+    Plays games against the server over one keep-alive connection and measures the latency of every request.
+    """
+    def __init__(self, host: str, port: int, seed: int):
+        self.connection = http.client.HTTPConnection(host, port)
+        self.random = random.Random(seed)
+        self.latencies: list[float] = []
+        self.errors = 0
+
+    def request(self, method: str, path: str, body: dict = None) -> dict:
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        started = perf_counter()
+        self.connection.request(method, path, payload, headers)
+        response = self.connection.getresponse()
+        data = json.loads(response.read())
+        self.latencies.append(perf_counter() - started)
+        if response.status >= 400:
+            self.errors += 1
+        return data
+
+    def play_game(self):
+        state = self.request("POST", "/games", {"sign": self.random.choice("XO"), "difficulty": "HARD"})
+        game = f"/games/{state['id']}"
+        while state["stage"] == "PLAYING":
+            free = [i for i, sign in enumerate(state["board"]) if sign == "-"]
+            r, c = divmod(self.random.choice(free), 3)
+            state = self.request("POST", f"{game}/moves", {"row": r, "col": c})
+        self.request("DELETE", game)
+
+    def run(self, games: int):
+        for _ in range(games):
+            self.play_game()
+        self.connection.close()
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the throughput and latency of the game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8080)
+    parser.add_argument("-c", "--clients", type=int, default=16, help="number of concurrent connections")
+    parser.add_argument("-n", "--games", type=int, default=100, help="games per client")
+    args = parser.parse_args(argv)
+
+    clients = [Client(args.host, args.port, seed) for seed in range(args.clients)]
+    threads = [threading.Thread(target=client.run, args=(args.games,)) for client in clients]
+    started = perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = perf_counter() - started
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    print(f"requests:     {len(latencies)} ({sum(c.errors for c in clients)} errors)")
+    print(f"requests/sec: {len(latencies) / seconds:.0f}")
+    print(f"p50 latency:  {percentile(latencies, 0.50) * 1000:.2f} ms")
+    print(f"p99 latency:  {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,137 @@
-from game import Game
-from strategy import ComputerStrategyBuilder, BasicStrategy
-import strategy
-
-# classes in saved computer.strategy file must be loaded into the __main__ namespace
-# because deserialization only detects classes in the correct namespace
-module_dict = globals()
-module_dict["ComputerStrategy"] = strategy.ComputerStrategy
-module_dict["StrategyNode"] = strategy.StrategyNode
-module_dict["Winner"] = strategy.Winner
-
-loaded_strategy = ComputerStrategyBuilder(strategy.FILENAME).load()
-if loaded_strategy:
-    print("Computer is playing with winning strategy.")
-    Game(loaded_strategy).launch()
-else:
-    print("Computer is playing with basic strategy.")
-    Game(BasicStrategy()).launch()
+from time import perf_counter
+
+STARTED = perf_counter()
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+from strategy import ComputerStrategyBuilder, BackgroundStrategy, LazyStrategy, Difficulty, FILENAME
+
+
+def since_start() -> str:
+    return f"{(perf_counter() - STARTED) * 1000:.0f} ms"
+
+
+def load_strategy(path: str, lazy: bool = False) -> BackgroundStrategy:
+    """
+    Loads the strategy in the background (it is rebuilt if the file is missing or outdated)
+    and reports when it is ready. The lazy strategy needs no file, it solves the positions during the game.
+    """
+    load = LazyStrategy if lazy else ComputerStrategyBuilder(path, use_symmetry=True).load_or_build
+    strategy = BackgroundStrategy(load)
+
+    def report(future):
+        if future.exception():
+            print(f"Cannot load the strategy: {future.exception()}")
+        else:
+            print(f"Strategy ready in {strategy.seconds * 1000:.0f} ms ({since_start()} after start)")
+
+    strategy.future.add_done_callback(report)
+    return strategy
+
+
+def gui(args):
+    from game import Game  # tkinter is only imported for the GUI
+
+    game = Game(load_strategy(args.file, args.lazy))
+    game.after(0, lambda: print(f"Window ready in {since_start()}"))
+
+    # e.g. RECORD_FILE=games.log appends every game into a game record log (see game_record.py)
+    recorder = None
+    if record_file := os.environ.get("RECORD_FILE"):
+        from game_record import GameRecorder
+        recorder = GameRecorder(Path(record_file))
+        game.game_engine.recorder = recorder
+
+    # e.g. METRICS_FILE=metrics.prom (Prometheus text format) or METRICS_FILE=metrics.json (JSON snapshot)
+    if metrics_file := os.environ.get("METRICS_FILE"):
+        from metrics import Metrics, instrument_engine
+        metrics = Metrics()
+        instrument_engine(game.game_engine, metrics)
+        stop_export = metrics.start_periodic_export(Path(metrics_file))
+        game.launch()
+        stop_export.set()
+        metrics.write(Path(metrics_file))
+    else:
+        game.launch()
+
+    if recorder:
+        recorder.close()
+
+
+def play_headless(args):
+    """
+    Plays a game in the terminal: the moves are read as "row column" lines from the standard input.
+    """
+    from game_engine import GameEngine, GameState
+
+    stage = {}
+    engine = GameEngine(lambda game_state: stage.update(current=game_state), load_strategy(args.file, args.lazy),
+                        think_time=0)
+    engine.connect_playing_state_change_handler(lambda state: None)
+    engine.launch()
+    print(f"Ready in {since_start()}")
+    engine.start_playing(args.sign, Difficulty[args.difficulty])
+    while stage["current"] == GameState.PLAYING:
+        print(engine.playing_state.board)
+        line = sys.stdin.readline()
+        if not line or line.strip() == "q":
+            return
+        try:
+            r, c = map(int, line.split())
+        except ValueError:
+            print("Enter the row and the column of your move (e.g. 0 2), or q to quit.")
+            continue
+        if r not in range(3) or c not in range(3) or engine.playing_state.board[(r, c)] is not None:
+            print("That cell is not available.")
+            continue
+        engine.player_chooses(r, c)
+    print(engine.playing_state.board)
+    winner = engine.gameover_state["winner"]
+    print("Tie." if winner is None else "You won." if winner == args.sign else "The computer won.")
+
+
+def build(args, rest: list[str]):
+    import strategy
+    strategy.main(["--file", args.file, *rest])
+
+
+def bench(args, rest: list[str]):
+    import benchmark
+    benchmark.main(rest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tic tac toe. Without a command the GUI is started.")
+    parser.add_argument("-f", "--file", default=FILENAME, help=f"strategy file (default: {FILENAME})")
+    parser.add_argument("--lazy", action="store_true",
+                        help="solve the positions during the game (LazyStrategy) instead of using the strategy file")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("gui", help="play in a window")
+    headless = commands.add_parser("play-headless", help="play in the terminal")
+    headless.add_argument("--sign", choices=("X", "O"), default="X")
+    headless.add_argument("--difficulty", choices=[d.name for d in Difficulty], default=Difficulty.HARD.name)
+    commands.add_parser("build", add_help=False, help="build the strategy file (see strategy.py -h)")
+    commands.add_parser("bench", add_help=False, help="run the benchmarks (see benchmark.py -h)")
+    args, rest = parser.parse_known_args(argv)
+
+    # e.g. LOG_LEVEL=DEBUG prints every move and state change
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper())
+
+    if args.command == "build":
+        build(args, rest)
+    elif args.command == "bench":
+        bench(args, rest)
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    elif args.command == "play-headless":
+        play_headless(args)
+    else:
+        gui(args)
+
+
+if __name__ == '__main__':
+    main()
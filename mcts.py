@@ -0,0 +1,228 @@
+import math
+import multiprocessing
+import random
+from collections import Counter
+from time import perf_counter
+from typing import Optional
+
+from bitboard import X_SIGN
+from mnk import BoardGeometry
+from strategy import Strategy, Difficulty
+
+# Part of the search budget (rollouts and time) used on each difficulty
+BUDGET_FRACTIONS: dict[Difficulty, float] = {
+    Difficulty.EASY: 0.02,
+    Difficulty.MEDIUM: 0.2,
+    Difficulty.HARD: 1.0,
+}
+
+DRAW = -1  # result of a rollout without winner (otherwise the id of the winner: 0 for X, 1 for O)
+
+
+class _Node:
+    """
+    A node of the search tree. The statistics are from the point of view of the player who moved into the node:
+    wins counts a won rollout as 1 and a drawn one as 0.5.
+    """
+    __slots__ = ("x", "o", "mover", "move", "parent", "children", "untried", "visits", "wins", "terminal")
+
+    def __init__(self, x: int, o: int, mover: int, move: Optional[int], parent: Optional["_Node"],
+                 untried: list[int], terminal: Optional[int] = None):
+        self.x = x
+        self.o = o
+        self.mover = mover
+        self.move = move
+        self.parent = parent
+        self.children: list[_Node] = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.terminal = terminal  # the result of the game if it is over in this node
+
+
+def playout(geometry: BoardGeometry, x: int, o: int, on_turn: int, rng: random.Random) -> int:
+    """
+    Plays the game randomly from the position until the end.
+    :return: the id of the winner (0 for X, 1 for O) or DRAW
+    """
+    occupied = x | o
+    cells = [i for i in range(geometry.cells) if not occupied >> i & 1]
+    rng.shuffle(cells)
+    masks = [x, o]
+    for cell in cells:
+        masks[on_turn] |= 1 << cell
+        if geometry.is_winning_move(masks[on_turn], cell):
+            return on_turn
+        on_turn ^= 1
+    return DRAW
+
+
+_worker_strategy: Optional["MCTSStrategy"] = None
+
+
+def _init_worker(geometry: BoardGeometry, exploration: float):
+    global _worker_strategy
+    # seeded from the OS, the forked workers must not share the random state
+    _worker_strategy = MCTSStrategy(geometry, exploration=exploration)
+
+
+def _search_root(task: tuple[int, int, str, int, Optional[float]]) -> dict[int, int]:
+    """
+    Runs an independent search of the position in a worker process. The worker keeps its tree between the tasks.
+    :param task: (x, o, sign on turn, number of playouts, time budget) of the search
+    :return: the visits of the moves of the root
+    """
+    x, o, sign, playouts, time_budget = task
+    strategy = _worker_strategy
+    strategy.playouts, strategy.time_budget = playouts, time_budget
+    strategy.search(x, o, sign)
+    return {child.move: child.visits for child in strategy.root.children}
+
+
+class MCTSStrategy(Strategy):
+    """
+    This strategy chooses its moves with Monte Carlo Tree Search on an m,n,k game, so it needs neither
+    a prebuilt strategy nor a full search of the game tree.
+    The tree is descended with the UCT rule, a leaf is expanded by one untried move and evaluated by random playouts,
+    and the results are propagated back to the root. The most visited move of the root is played.
+    The search stops after the given number of playouts or when the time budget runs out, whichever comes first.
+    The difficulty determines which part of the budget is used (see BUDGET_FRACTIONS).
+    The tree is kept between the moves: if the next position is in the tree (after the opponent's answer),
+    the search continues from its subtree.
+    With more than one worker the search is parallelized at the root: every worker of a process pool searches
+    the position in its own tree with its share of the playouts (within the same time budget),
+    and the move with the most visits summed over the trees is played. So there is one round trip to the pool per move.
+    The pool should be released with close().
+    """
+    def __init__(self, geometry: BoardGeometry = BoardGeometry(), playouts: int = 2000,
+                 time_budget: Optional[float] = None, workers: int = 1,
+                 exploration: float = math.sqrt(2), seed: Optional[int] = None):
+        self.geometry = geometry
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.workers = workers
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.pool = None
+        self.root: Optional[_Node] = None
+
+    def step(self, board, sign: str, difficulty: Difficulty) -> tuple[int, int]:
+        """
+        :param board: a GameBoard (for the default geometry) or an MNKBoard of the strategy's geometry.
+        """
+        cell = self.search(board.x, board.o, sign, BUDGET_FRACTIONS[difficulty])
+        return divmod(cell, self.geometry.cols)
+
+    def search(self, x: int, o: int, sign: str, fraction: float = 1.0) -> int:
+        """
+        Runs the search from the position and returns the best cell for the player on turn.
+        At least one playout is run, even if the time budget is already over.
+        """
+        playouts = max(1, int(self.playouts * fraction))
+        time_budget = self.time_budget * fraction if self.time_budget is not None else None
+        if self.workers > 1:
+            visits = Counter()
+            task = (x, o, sign, math.ceil(playouts / self.workers), time_budget)
+            for root_visits in self.get_pool().map(_search_root, [task] * self.workers):
+                visits.update(root_visits)
+            return max(visits, key=visits.get)
+
+        root = self.root = self.find_root(x, o, sign)
+        deadline = perf_counter() + time_budget if time_budget is not None else None
+        done = 0
+        while True:
+            self.evaluate(self.select(root))
+            done += 1
+            if done >= playouts or deadline is not None and perf_counter() >= deadline:
+                break
+        best = max(root.children, key=lambda child: child.visits)
+        return best.move
+
+    def find_root(self, x: int, o: int, sign: str) -> _Node:
+        """
+        Looks for the position among the nodes of the previous search (at most 2 moves deep),
+        or creates a new tree.
+        """
+        if self.root is not None:
+            candidates = [self.root] + self.root.children
+            candidates += [grandchild for child in self.root.children for grandchild in child.children]
+            for node in candidates:
+                if node.x == x and node.o == o and node.terminal is None:
+                    node.parent = None
+                    return node
+        mover = 1 if sign == X_SIGN else 0  # the opponent moved into the root
+        return _Node(x, o, mover, None, None, self.candidate_moves(x | o))
+
+    def candidate_moves(self, occupied: int) -> list[int]:
+        """
+        The cells near (at most 2 cells away from) the signs on the board, or the center of an empty board.
+        """
+        geometry = self.geometry
+        if not occupied:
+            return [geometry.center]
+        near = 0
+        for i in range(geometry.cells):
+            if occupied >> i & 1:
+                near |= geometry.neighbours[i]
+        candidates = near & ~occupied or geometry.full_mask & ~occupied
+        moves = [i for i in range(geometry.cells) if candidates >> i & 1]
+        self.rng.shuffle(moves)
+        return moves
+
+    def select(self, node: _Node) -> _Node:
+        """
+        Descends the tree with the UCT rule and expands a leaf. The nodes of the path are counted as visited.
+        """
+        node.visits += 1
+        while node.terminal is None:
+            if node.untried:
+                node = self.expand(node)
+                node.visits += 1
+                break
+            log_visits = math.log(node.visits)
+            exploration = self.exploration
+            node = max(node.children, key=lambda child: child.wins / child.visits
+                       + exploration * math.sqrt(log_visits / child.visits))
+            node.visits += 1
+        return node
+
+    def expand(self, node: _Node) -> _Node:
+        geometry = self.geometry
+        cell = node.untried.pop()
+        mover = 1 - node.mover
+        x, o = (node.x | 1 << cell, node.o) if mover == 0 else (node.x, node.o | 1 << cell)
+        if geometry.is_winning_move(x if mover == 0 else o, cell):
+            child = _Node(x, o, mover, cell, node, [], terminal=mover)
+        elif x | o == geometry.full_mask:
+            child = _Node(x, o, mover, cell, node, [], terminal=DRAW)
+        else:
+            child = _Node(x, o, mover, cell, node, self.candidate_moves(x | o))
+        node.children.append(child)
+        return child
+
+    def evaluate(self, leaf: _Node):
+        """
+        Plays out the leaf (unless the game is over in it) and propagates the result.
+        """
+        winner = leaf.terminal if leaf.terminal is not None else playout(self.geometry, leaf.x, leaf.o,
+                                                                          1 - leaf.mover, self.rng)
+        self.backpropagate(leaf, winner == 0, winner == 1)
+
+    @staticmethod
+    def backpropagate(node: Optional[_Node], x_wins: int, o_wins: int):
+        # the visits were counted by select, a draw is worth half a win for both players
+        draws = 1 - x_wins - o_wins
+        while node is not None:
+            node.wins += (x_wins if node.mover == 0 else o_wins) + draws / 2
+            node = node.parent
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, _init_worker, (self.geometry, self.exploration))
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -0,0 +1,184 @@
+import json
+import threading
+from bisect import bisect_left
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter, time
+from typing import Optional
+
+from game_engine import GameEngine, GameState
+from game_play_state import GamePlayState
+from strategy import Strategy, Difficulty
+
+PREFIX = "tictactoe_"
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS: tuple[float, ...] = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    A small registry of counters, gauges and histograms with labels.
+    It can be exported in the Prometheus text format or as a JSON snapshot.
+    Nothing is measured unless the objects are instrumented with it (see instrument_engine),
+    so the game costs nothing extra when the metrics are not used.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.gauges: dict[str, Callable[[], dict[Labels, float]]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        key = tuple(labels.items())
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(labels.items())
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key) or series.setdefault(key, Histogram())
+            histogram.observe(value)
+
+    def register_gauge(self, name: str, collect: Callable[[], dict[Labels, float]]):
+        """
+        Registers a gauge whose values are collected at export time (e.g. the counters of a cache).
+        """
+        self.gauges[name] = collect
+
+    @staticmethod
+    def format_labels(labels: Labels, extra: str = "") -> str:
+        parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            for name, series in self.counters.items():
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines += [f"{PREFIX}{name}{self.format_labels(k)} {v}" for k, v in series.items()]
+            for name, series in self.histograms.items():
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip((*h.buckets, "+Inf"), h.counts):
+                        cumulative += count
+                        bucket_labels = self.format_labels(labels, f'le="{bound}"')
+                        lines.append(f"{PREFIX}{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{self.format_labels(labels)} {h.sum}")
+                    lines.append(f"{PREFIX}{name}_count{self.format_labels(labels)} {h.count}")
+        for name, collect in self.gauges.items():
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            lines += [f"{PREFIX}{name}{self.format_labels(k)} {v}" for k, v in collect().items()]
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            result = {
+                "timestamp": time(),
+                "counters": {name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                             for name, series in self.counters.items()},
+                "histograms": {name: [{"labels": dict(k), "buckets": list(h.buckets), "counts": list(h.counts),
+                                       "sum": h.sum, "count": h.count} for k, h in series.items()]
+                               for name, series in self.histograms.items()},
+            }
+        result["gauges"] = {name: [{"labels": dict(k), "value": v} for k, v in collect().items()]
+                            for name, collect in self.gauges.items()}
+        return result
+
+    def write(self, path: Path):
+        """
+        Writes the metrics into the file: a JSON snapshot for .json files, the Prometheus text format otherwise.
+        The file is replaced atomically, so a scraper never reads a partial file.
+        """
+        text = json.dumps(self.snapshot()) if path.suffix == ".json" else self.to_prometheus()
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(text)
+        tmp.replace(path)
+
+    def start_periodic_export(self, path: Path, interval: float = 10.0) -> threading.Event:
+        """
+        Writes the metrics into the file periodically on a daemon thread until the returned event is set.
+        """
+        stop = threading.Event()
+
+        def export():
+            while not stop.wait(interval):
+                self.write(path)
+            self.write(path)
+
+        threading.Thread(target=export, daemon=True).start()
+        return stop
+
+
+class InstrumentedStrategy(Strategy):
+    """
+    Wraps a strategy and measures the latency of its steps.
+    The hits and misses of strategies with a cache (like the LazyStrategy) are exported as gauges.
+    """
+    def __init__(self, strategy: Strategy, metrics: Metrics):
+        self.strategy = strategy
+        self.metrics = metrics
+        self.name = type(strategy).__name__
+        if hasattr(strategy, "hits") and hasattr(strategy, "misses"):
+            metrics.register_gauge("strategy_cache_hits", lambda: {(("strategy", self.name),): strategy.hits})
+            metrics.register_gauge("strategy_cache_misses", lambda: {(("strategy", self.name),): strategy.misses})
+
+    def step(self, board: GamePlayState.GameBoard, sign: str, difficulty: Difficulty) -> tuple[int, int]:
+        started = perf_counter()
+        move = self.strategy.step(board, sign, difficulty)
+        self.metrics.observe("strategy_step_seconds", perf_counter() - started,
+                             strategy=self.name, difficulty=difficulty.name)
+        return move
+
+
+def instrument_engine(engine: GameEngine, metrics: Metrics):
+    """
+    Instruments the engine: counts the started and finished games by difficulty (and result),
+    measures the latency of the computer's moves (including its thinking time) and the steps of the strategy.
+    """
+    engine.computer_strategy = InstrumentedStrategy(engine.computer_strategy, metrics)
+    listener = engine.listener
+
+    def gamestate_listener(game_state: GameState):
+        player = engine.computer_player
+        if game_state == GameState.PLAYING:
+            metrics.inc("games_started_total", difficulty=player.difficulty.name)
+            next_move = player.next_move
+
+            def timed_next_move(board: GamePlayState.GameBoard) -> tuple[int, int]:
+                started = perf_counter()
+                move = next_move(board)
+                metrics.observe("computer_move_seconds", perf_counter() - started, difficulty=player.difficulty.name)
+                return move
+
+            player.next_move = timed_next_move
+        elif game_state == GameState.GAMEOVER:
+            metrics.inc("games_finished_total", difficulty=player.difficulty.name,
+                        result=game_result(engine.gameover_state["winner"], engine.player_sign))
+        listener(game_state)
+
+    engine.listener = gamestate_listener
+
+
+def game_result(winner: Optional[str], player_sign: str) -> str:
+    if winner is None or winner is True:
+        return "tie"
+    return "player" if winner == player_sign else "computer"
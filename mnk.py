@@ -0,0 +1,287 @@
+import random
+from time import perf_counter
+from typing import Optional
+
+from bitboard import X_SIGN, O_SIGN
+from strategy import Strategy, Difficulty
+
+WIN_SCORE = 1_000_000
+# Scores above this are wins found by the search (WIN_SCORE minus the number of moves to the win)
+WIN_BOUND = WIN_SCORE - 10_000
+
+EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+# Maximal search depth for each difficulty (None means that only the time budget limits the search)
+DEPTH_LIMITS: dict[Difficulty, Optional[int]] = {
+    Difficulty.EASY: 1,
+    Difficulty.MEDIUM: 2,
+    Difficulty.HARD: None,
+}
+
+
+class BoardGeometry:
+    """
+    This class describes an m,n,k game: a board with the given rows and columns
+    where k signs in a row (horizontally, vertically or diagonally) win.
+    Cell i of the board is (i // cols, i % cols) and it is bit i of the board masks.
+    The default is the 3x3 tic-tac-toe, which is compatible with the GameBoard.
+    """
+    def __init__(self, rows: int = 3, cols: int = 3, k: int = 3):
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.cells = rows * cols
+        self.full_mask = (1 << self.cells) - 1
+        self.center = (rows // 2) * cols + cols // 2
+        self.win_masks: tuple[int, ...] = tuple(self.compute_win_masks())
+        self.lines_through: tuple[tuple[int, ...], ...] = tuple(
+            tuple(m for m in self.win_masks if m >> i & 1) for i in range(self.cells))
+        self.neighbours: tuple[int, ...] = tuple(self.compute_neighbours(i, 2) for i in range(self.cells))
+
+    def compute_win_masks(self):
+        for r in range(self.rows):
+            for c in range(self.cols):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_r, end_c = r + dr * (self.k - 1), c + dc * (self.k - 1)
+                    if 0 <= end_r < self.rows and 0 <= end_c < self.cols:
+                        yield sum(1 << ((r + dr * j) * self.cols + c + dc * j) for j in range(self.k))
+
+    def compute_neighbours(self, cell: int, distance: int) -> int:
+        r, c = divmod(cell, self.cols)
+        mask = 0
+        for nr in range(max(0, r - distance), min(self.rows, r + distance + 1)):
+            for nc in range(max(0, c - distance), min(self.cols, c + distance + 1)):
+                mask |= 1 << (nr * self.cols + nc)
+        return mask
+
+    def is_winning_move(self, mask: int, cell: int) -> bool:
+        """
+        Tells whether the mask has a full line through the cell. (Only these lines can be completed by a move to the cell.)
+        """
+        return any(mask & m == m for m in self.lines_through[cell])
+
+
+class MNKBoard:
+    """
+    A board of an m,n,k game addressed by (row, column) coordinates.
+    Like the GameBoard, it stores the signs of X and O in two integers.
+    """
+    def __init__(self, geometry: BoardGeometry, x: int = 0, o: int = 0):
+        self.geometry = geometry
+        self.x = x
+        self.o = o
+
+    def __getitem__(self, key: tuple[int, int]) -> Optional[str]:
+        bit = 1 << (key[0] * self.geometry.cols + key[1])
+        return X_SIGN if self.x & bit else O_SIGN if self.o & bit else None
+
+    def __setitem__(self, key: tuple[int, int], value: Optional[str]):
+        bit = 1 << (key[0] * self.geometry.cols + key[1])
+        self.x &= ~bit
+        self.o &= ~bit
+        if value == X_SIGN:
+            self.x |= bit
+        elif value == O_SIGN:
+            self.o |= bit
+
+    def empty_cells(self) -> list[int]:
+        empty = self.geometry.full_mask & ~(self.x | self.o)
+        return [i for i in range(self.geometry.cells) if empty >> i & 1]
+
+    def winner(self) -> Optional[str]:
+        if any(self.x & m == m for m in self.geometry.win_masks):
+            return X_SIGN
+        if any(self.o & m == m for m in self.geometry.win_masks):
+            return O_SIGN
+        return None
+
+    def is_full(self) -> bool:
+        return self.x | self.o == self.geometry.full_mask
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+class AlphaBetaStrategy(Strategy):
+    """
+    This strategy searches the game tree of an m,n,k game with negamax and alpha-beta pruning.
+    The search is iteratively deepened until the time budget of the move runs out,
+    and the best move of the deepest completed iteration is returned.
+    The positions are cached in a transposition table keyed by the Zobrist hash of the board,
+    which is kept between moves. The moves are ordered by the move stored in the transposition table first,
+    and by the history heuristic (how often a move caused a cutoff) after.
+    Moves are only considered near (at most 2 cells away from) the signs already on the board.
+    Beyond the search depth the positions are evaluated by counting the lines that are still open for a player.
+    """
+    def __init__(self, geometry: BoardGeometry = BoardGeometry(), time_budget: float = 1.0,
+                 table_size: int = 1 << 20, seed: int = 0):
+        self.geometry = geometry
+        self.time_budget = time_budget
+        self.table_size = table_size
+        rng = random.Random(seed)
+        self.zobrist: tuple[tuple[int, ...], ...] = tuple(
+            tuple(rng.getrandbits(64) for _ in range(geometry.cells)) for _ in (X_SIGN, O_SIGN))
+        self.table: dict[int, tuple[int, int, int, int]] = {}  # hash -> (depth, score, flag, best move)
+        self.history = [0] * geometry.cells
+        self.line_weights = [0] + [4 ** n for n in range(geometry.k)]
+        self.deadline = 0.0
+        self.nodes = 0
+
+    def step(self, board, sign: str, difficulty: Difficulty) -> tuple[int, int]:
+        """
+        :param board: a GameBoard (for the default geometry) or an MNKBoard of the strategy's geometry.
+        """
+        cell = self.search(board.x, board.o, sign, DEPTH_LIMITS[difficulty])
+        return divmod(cell, self.geometry.cols)
+
+    def search(self, x: int, o: int, sign: str, depth_limit: Optional[int] = None) -> int:
+        """
+        Runs the iterative deepening search from the position and returns the best cell for the player on turn.
+        """
+        geometry = self.geometry
+        me, opp, me_id = (x, o, 0) if sign == X_SIGN else (o, x, 1)
+        empty_count = geometry.cells - (x | o).bit_count()
+        max_depth = empty_count if depth_limit is None else min(depth_limit, empty_count)
+        if len(self.table) > self.table_size:
+            self.table.clear()
+        self.history = [h >> 1 for h in self.history]  # let the old history fade
+        self.deadline = perf_counter() + self.time_budget
+        self.nodes = 0
+
+        h = self.hash(x, o)
+        near = self.near_mask(x | o)
+        root_moves = self.ordered_moves(me | opp, near, None)
+        best_move = root_moves[0]
+        if len(root_moves) == 1:  # a forced move (e.g. the center of an empty board) needs no search
+            return best_move
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self.search_root(me, opp, me_id, h, near, depth, root_moves)
+            except _SearchTimeout:
+                break
+            best_move = move
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+            if abs(score) > WIN_BOUND:  # the game is decided, deeper search cannot change it
+                break
+        return best_move
+
+    def search_root(self, me, opp, me_id, h, near, depth, root_moves) -> tuple[int, int]:
+        alpha, beta = -WIN_SCORE, WIN_SCORE
+        best_score, best_move = -WIN_SCORE - 1, root_moves[0]
+        for cell in root_moves:
+            score = self.score_move(me, opp, me_id, h, near, depth, 0, cell, alpha, beta)
+            if score > best_score:
+                best_score, best_move = score, cell
+            alpha = max(alpha, score)
+        self.table[h] = (depth, best_score, EXACT, best_move)
+        return best_score, best_move
+
+    def score_move(self, me, opp, me_id, h, near, depth, ply, cell, alpha, beta) -> int:
+        geometry = self.geometry
+        mine = me | 1 << cell
+        if geometry.is_winning_move(mine, cell):
+            return WIN_SCORE - ply - 1
+        return -self.negamax(opp, mine, 1 - me_id, h ^ self.zobrist[me_id][cell], near | geometry.neighbours[cell],
+                             depth - 1, ply + 1, -beta, -alpha)
+
+    def negamax(self, me, opp, me_id, h, near, depth, ply, alpha, beta) -> int:
+        self.nodes += 1
+        if not self.nodes & 1023 and perf_counter() > self.deadline:
+            raise _SearchTimeout()
+        occupied = me | opp
+        if occupied == self.geometry.full_mask:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, opp)
+
+        alpha_orig = alpha
+        tt_move = None
+        if entry := self.table.get(h):
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if tt_depth >= depth:
+                tt_score = self.score_from_table(tt_score, ply)
+                if tt_flag == EXACT:
+                    return tt_score
+                if tt_flag == LOWER_BOUND:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    return tt_score
+
+        best_score, best_move = -WIN_SCORE - 1, None
+        for cell in self.ordered_moves(occupied, near, tt_move):
+            score = self.score_move(me, opp, me_id, h, near, depth, ply, cell, alpha, beta)
+            if score > best_score:
+                best_score, best_move = score, cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.history[cell] += depth * depth
+                break
+
+        flag = UPPER_BOUND if best_score <= alpha_orig else LOWER_BOUND if best_score >= beta else EXACT
+        self.table[h] = (depth, self.score_to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    def ordered_moves(self, occupied: int, near: int, tt_move: Optional[int]) -> list[int]:
+        geometry = self.geometry
+        candidates = near & ~occupied if occupied else 1 << geometry.center
+        if not candidates:  # no free cell near the signs, any free cell will do
+            candidates = geometry.full_mask & ~occupied
+        moves = [i for i in range(geometry.cells) if candidates >> i & 1]
+        history = self.history
+        moves.sort(key=lambda i: history[i], reverse=True)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def evaluate(self, me: int, opp: int) -> int:
+        """
+        Static evaluation from the point of view of the player on turn:
+        the lines containing only the player's signs are counted with a weight growing with the number of signs.
+        """
+        weights = self.line_weights
+        score = 0
+        for line in self.geometry.win_masks:
+            mine, theirs = me & line, opp & line
+            if mine and not theirs:
+                score += weights[mine.bit_count()]
+            elif theirs and not mine:
+                score -= weights[theirs.bit_count()]
+        return score
+
+    def hash(self, x: int, o: int) -> int:
+        h = 0
+        for player_id, mask in enumerate((x, o)):
+            for i in range(self.geometry.cells):
+                if mask >> i & 1:
+                    h ^= self.zobrist[player_id][i]
+        return h
+
+    def near_mask(self, occupied: int) -> int:
+        near = 0
+        for i in range(self.geometry.cells):
+            if occupied >> i & 1:
+                near |= self.geometry.neighbours[i]
+        return near
+
+    @staticmethod
+    def score_to_table(score: int, ply: int) -> int:
+        # win scores are stored relative to the position, not to the root
+        if score > WIN_BOUND:
+            return score + ply
+        if score < -WIN_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_table(score: int, ply: int) -> int:
+        if score > WIN_BOUND:
+            return score - ply
+        if score < -WIN_BOUND:
+            return score + ply
+        return score
@@ -0,0 +1,255 @@
+import argparse
+import json
+import re
+import secrets
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+from typing import Optional
+
+from game_engine import GameEngine, GameState
+from game_play_state import GamePlayState, GameTurn
+from strategy import Strategy, ComputerStrategyBuilder, Difficulty, FILENAME
+
+
+class Session:
+    """
+    One game of a player on the server. It owns a GameEngine (without thinking time) and keeps track of the game stage.
+    """
+    def __init__(self, session_id: str, strategy: Strategy):
+        self.id = session_id
+        self.lock = threading.Lock()
+        self.stage: Optional[GameState] = None
+        self.last_access = monotonic()
+        self.engine = GameEngine(self.gamestate_changed, strategy, think_time=0)
+        self.engine.connect_playing_state_change_handler(self.playing_state_changed)
+        self.engine.launch()
+
+    def gamestate_changed(self, game_state: GameState):
+        self.stage = game_state
+
+    def playing_state_changed(self, state: GamePlayState):
+        ...
+
+    def to_json(self) -> dict:
+        engine = self.engine
+        result = {"id": self.id, "stage": self.stage.value, "player": engine.player_sign}
+        if self.stage == GameState.PLAYING:
+            result["board"] = board_to_text(engine.playing_state.board.items())
+            result["turn"] = engine.playing_state.turn.value
+        elif self.stage == GameState.GAMEOVER:
+            result["board"] = board_to_text(engine.gameover_state["board"])
+            winner = engine.gameover_state["winner"]
+            result["winner"] = winner if winner is not True else None
+        return result
+
+
+def board_to_text(items: list[tuple[tuple[int, int], Optional[str]]]) -> str:
+    return "".join(sign or "-" for (_, sign) in items)
+
+
+class SessionTable:
+    """
+    The sessions of the server by id. Sessions which are not used for idle_timeout seconds are evicted.
+    All the sessions share the same (read-only) strategy.
+    """
+    def __init__(self, strategy: Strategy, idle_timeout: float = 600):
+        self.strategy = strategy
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[str, Session] = {}
+        self.lock = threading.Lock()
+
+    def create(self) -> Session:
+        session = Session(secrets.token_urlsafe(12), self.strategy)
+        with self.lock:
+            self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self.sessions.get(session_id)
+        if session:
+            session.last_access = monotonic()
+        return session
+
+    def remove(self, session_id: str) -> bool:
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def evict_idle(self) -> int:
+        deadline = monotonic() - self.idle_timeout
+        with self.lock:
+            idle = [s.id for s in self.sessions.values() if s.last_access < deadline]
+            for session_id in idle:
+                del self.sessions[session_id]
+        return len(idle)
+
+    def run_eviction(self, stop: threading.Event, interval: float):
+        while not stop.wait(interval):
+            self.evict_idle()
+
+
+class GameRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the game server:
+      POST   /games                 {"sign": "X", "difficulty": "HARD"} starts a new game
+      GET    /games/<id>            returns the state of the game
+      POST   /games/<id>/moves      {"row": 0, "col": 2} makes the move of the player (and the computer answers)
+      POST   /games/<id>/restart    goes back to the start stage, a new game can be started with POST /games/<id>
+      DELETE /games/<id>            ends the session
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are written separately, don't wait for delayed ACKs
+    sessions: SessionTable = None  # set by create_server
+    path_pattern = re.compile(r"^/games(?:/([\w-]+)(?:/(moves|restart))?)?/?$")
+
+    def log_message(self, format, *args):
+        ...  # one line for every request would cost more than the request itself
+
+    def do_GET(self):
+        session_id, action = self.parse_path()
+        if session_id is None or action:
+            return self.send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+        if session := self.find_session(session_id):
+            with session.lock:
+                self.send_json(HTTPStatus.OK, session.to_json())
+
+    def do_POST(self):
+        session_id, action = self.parse_path()
+        if action == "invalid":
+            return self.send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+        body = self.read_json()
+        if body is None:
+            return
+        if session_id is None:
+            if settings := self.parse_start(body):
+                session = self.sessions.create()
+                with session.lock:
+                    self.start_game(session, settings)
+        elif session := self.find_session(session_id):
+            with session.lock:
+                if action == "moves":
+                    self.make_move(session, body)
+                elif action == "restart":
+                    session.engine.restart()
+                    self.send_json(HTTPStatus.OK, session.to_json())
+                elif settings := self.parse_start(body):
+                    self.start_game(session, settings)
+
+    def do_DELETE(self):
+        session_id, action = self.parse_path()
+        if session_id and not action and self.sessions.remove(session_id):
+            self.send_json(HTTPStatus.OK, {"id": session_id})
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "unknown game"})
+
+    def parse_start(self, body: dict) -> Optional[tuple[str, Difficulty]]:
+        """
+        Validates the sign and the difficulty of a new game, an invalid body is answered with 400 and returns None.
+        """
+        sign = body.get("sign", "X")
+        try:
+            difficulty = Difficulty[str(body.get("difficulty", "HARD")).upper()]
+        except KeyError:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid difficulty"})
+        if sign not in ("X", "O"):
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid sign"})
+        return sign, difficulty
+
+    def start_game(self, session: Session, settings: tuple[str, Difficulty]):
+        if session.stage != GameState.START:
+            return self.send_json(HTTPStatus.CONFLICT, {"error": "the game is already started"})
+        session.engine.start_playing(*settings)
+        self.send_json(HTTPStatus.CREATED, session.to_json())
+
+    def make_move(self, session: Session, body: dict):
+        if session.stage != GameState.PLAYING or session.engine.playing_state.turn != GameTurn.PLAYER:
+            return self.send_json(HTTPStatus.CONFLICT, {"error": "the player is not on turn"})
+        r, c = body.get("row"), body.get("col")
+        if not all(isinstance(v, int) and not isinstance(v, bool) and v in range(3) for v in (r, c)):
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid cell"})
+        if session.engine.playing_state.board[(r, c)] is not None:
+            return self.send_json(HTTPStatus.CONFLICT, {"error": "the cell is not empty"})
+        session.engine.player_chooses(r, c)
+        self.send_json(HTTPStatus.OK, session.to_json())
+
+    def parse_path(self) -> tuple[Optional[str], Optional[str]]:
+        match = self.path_pattern.match(self.path)
+        return (match.group(1), match.group(2)) if match else (None, "invalid")
+
+    def find_session(self, session_id: str) -> Optional[Session]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "unknown game"})
+        return session
+
+    def read_json(self) -> Optional[dict]:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # the body cannot be skipped, the connection is out of sync
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"})
+            return None
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid JSON body"})
+            return None
+        return body
+
+    def send_json(self, status: HTTPStatus, data: dict):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class GameServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # many clients connect at the same time
+
+
+def create_server(strategy: Strategy, port: int = 8080, idle_timeout: float = 600) -> GameServer:
+    handler = type("Handler", (GameRequestHandler,), {"sessions": SessionTable(strategy, idle_timeout)})
+    return GameServer(("127.0.0.1", port), handler)
+
+
+def load_strategy() -> Strategy:
+    """
+    Loads the strategy file (it is rebuilt if it is missing, corrupt or outdated).
+    """
+    strategy = ComputerStrategyBuilder(FILENAME, use_symmetry=True).load_or_build()
+    print("Computer is playing with winning strategy.")
+    return strategy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves many games on localhost over HTTP.")
+    parser.add_argument("-p", "--port", type=int, default=8080)
+    parser.add_argument("--idle-timeout", type=float, default=600, help="seconds after an unused game is evicted")
+    args = parser.parse_args(argv)
+
+    server = create_server(load_strategy(), args.port, args.idle_timeout)
+    stop = threading.Event()
+    sessions = server.RequestHandlerClass.sessions
+    threading.Thread(target=sessions.run_eviction, args=(stop, min(60.0, args.idle_timeout)), daemon=True).start()
+    print(f"Serving on http://127.0.0.1:{args.port}/games")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
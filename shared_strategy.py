@@ -0,0 +1,85 @@
+import sys
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Optional
+
+from bitboard import BOARD_COUNT
+from strategy import ComputerStrategy, DIFFICULTY_COUNT, STRENGTH_SLOTS, FILENAME
+from strategy_file import StrategyFileError, HEADER, contents_size, parse_tables, read_header
+
+
+class SharedStrategyTable:
+    """
+    The contents of a strategy file published in a shared memory block by a parent process,
+    so that its worker processes can attach to it (see SharedStrategy) instead of loading the strategy one by one.
+    The block holds the file as it is (header with version and checksum included), and it is validated before publishing.
+    The publisher owns the block: close() (or leaving the with block) removes it.
+    """
+    def __init__(self, shm: SharedMemory):
+        self.shm = shm
+
+    @classmethod
+    def publish(cls, path: Path = Path(FILENAME), name: Optional[str] = None) -> "SharedStrategyTable":
+        """
+        :raises StrategyFileError: if the file is corrupt or has an incompatible version.
+        """
+        data = Path(path).read_bytes()
+        parse_tables(memoryview(data), str(path), BOARD_COUNT, DIFFICULTY_COUNT, STRENGTH_SLOTS)
+        shm = SharedMemory(name, create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return cls(shm)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedStrategyTable":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedStrategy(ComputerStrategy):
+    """
+    A ComputerStrategy which reads the tables directly from a shared memory block published by a SharedStrategyTable
+    (no copy is made). It should be closed before the process exits; the block itself is removed by the publisher.
+    """
+    def __init__(self, shm: SharedMemory):
+        self.shm = shm
+        self.data = shm.buf[:contents_size(shm.buf)]  # the block can be larger than requested (rounded to pages)
+        try:
+            super().__init__(*parse_tables(self.data, f"shared memory {shm.name}", BOARD_COUNT, DIFFICULTY_COUNT,
+                                          STRENGTH_SLOTS))
+        except StrategyFileError:
+            self.data.release()
+            shm.close()
+            raise
+
+    @classmethod
+    def attach(cls, name: str, path: Optional[Path] = Path(FILENAME)) -> "SharedStrategy":
+        """
+        Attaches to the published block.
+        :param path: if given, the block is checked against the header (version and checksum) of this file,
+        so a block published before the file was rebuilt is not used.
+        :raises StrategyFileError: if the block is invalid or stale.
+        """
+        if sys.version_info >= (3, 13):
+            shm = SharedMemory(name, track=False)  # the publisher is responsible for removing it
+        else:
+            shm = SharedMemory(name)
+        strategy = cls(shm)
+        if path is not None and read_header(path) != HEADER.unpack_from(strategy.data):
+            strategy.close()
+            raise StrategyFileError(f"shared memory {name} is stale, {path} has changed since it was published")
+        return strategy
+
+    def close(self):
+        for view in (self.values, self.depths, self.moves, self.strength_index, self.strength_tables, self.data):
+            if isinstance(view, memoryview):
+                view.release()
+        self.shm.close()
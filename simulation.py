@@ -0,0 +1,202 @@
+import argparse
+import multiprocessing
+import random
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple, Optional
+
+from bitboard import X_SIGN, O_SIGN, SIZE
+from game_play_state import GamePlayState
+from strategy import Strategy, BasicStrategy, ComputerStrategyBuilder, Difficulty, StrengthStrategy, FILENAME
+
+
+def load_computer_strategy() -> Strategy:
+    return ComputerStrategyBuilder(FILENAME, use_symmetry=True).load_or_build()
+
+
+def create_alpha_beta_strategy() -> Strategy:
+    from mnk import AlphaBetaStrategy
+    return AlphaBetaStrategy(time_budget=0.1)
+
+
+def create_mcts_strategy() -> Strategy:
+    from mcts import MCTSStrategy
+    return MCTSStrategy(playouts=1000)
+
+
+# The strategies are created by name in the worker processes, so they don't need to be picklable
+STRATEGY_FACTORIES: dict[str, Callable[[], Strategy]] = {
+    "basic": BasicStrategy,
+    "computer": load_computer_strategy,
+    "alphabeta": create_alpha_beta_strategy,
+    "mcts": create_mcts_strategy,
+}
+
+
+class PlayerConfig(NamedTuple):
+    strategy: str
+    difficulty: Difficulty
+    strength: Optional[float] = None  # the computer strategy plays on this strength instead of the difficulty
+
+    @classmethod
+    def parse(cls, text: str) -> "PlayerConfig":
+        """
+        Parses a "strategy:DIFFICULTY" string (e.g. "computer:HARD"), or "computer:STRENGTH" (e.g. "computer:0.7").
+        """
+        strategy, _, difficulty = text.partition(":")
+        if strategy not in STRATEGY_FACTORIES:
+            raise ValueError(f"Unknown strategy {strategy}, choose from {', '.join(STRATEGY_FACTORIES)}")
+        try:
+            strength = float(difficulty)
+        except ValueError:
+            pass
+        else:
+            if strategy != "computer":
+                raise ValueError("Only the computer strategy can play on a strength")
+            return cls(strategy, Difficulty.HARD, strength)
+        try:
+            return cls(strategy, Difficulty[difficulty.upper() or "HARD"])
+        except KeyError as e:
+            raise ValueError(f"Unknown difficulty {difficulty}, choose from {', '.join(d.name for d in Difficulty)}") from e
+
+    def create_player(self, strategy: Strategy) -> tuple[Strategy, Difficulty]:
+        if self.strength is not None:
+            strategy = StrengthStrategy(strategy, self.strength)
+        return strategy, self.difficulty
+
+
+class ChunkResult(NamedTuple):
+    wins: int
+    draws: int
+    losses: int
+    moves: int
+
+
+class SimulationReport(NamedTuple):
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    moves: int
+    seconds: float
+
+    def __str__(self):
+        return "\n".join([
+            f"games:          {self.games}",
+            f"win rate:       {self.wins / self.games:.4f}",
+            f"draw rate:      {self.draws / self.games:.4f}",
+            f"loss rate:      {self.losses / self.games:.4f}",
+            f"average length: {self.moves / self.games:.2f} moves",
+            f"games/second:   {self.games / self.seconds:.0f}",
+        ])
+
+
+_players: Optional[tuple[tuple[Strategy, Difficulty], tuple[Strategy, Difficulty]]] = None
+
+
+def _init_worker(first: PlayerConfig, second: PlayerConfig, shared_table: Optional[str] = None):
+    global _players
+    strategies = {name: STRATEGY_FACTORIES[name]() for name in {first.strategy, second.strategy}
+                  if not (shared_table and name == "computer")}
+    if shared_table:
+        from shared_strategy import SharedStrategy
+        strategies["computer"] = SharedStrategy.attach(shared_table, Path(FILENAME))
+    _players = (first.create_player(strategies[first.strategy]), second.create_player(strategies[second.strategy]))
+
+
+def play_game(x_player: tuple[Strategy, Difficulty], o_player: tuple[Strategy, Difficulty]) -> tuple[Optional[str], int]:
+    """
+    Plays one game without any UI or delay.
+    :return: the sign of the winner (None for a tie) and the number of moves.
+    """
+    board = GamePlayState.GameBoard()
+    players = {X_SIGN: x_player, O_SIGN: o_player}
+    sign = X_SIGN
+    moves = 0
+    while True:
+        strategy, difficulty = players[sign]
+        r, c = strategy.step(board, sign, difficulty)
+        board.set_sign(r * SIZE + c, sign)
+        moves += 1
+        if winner := board.winner():
+            return winner, moves
+        if board.is_full():
+            return None, moves
+        sign = O_SIGN if sign == X_SIGN else X_SIGN
+
+
+def _play_chunk(seed: int, games: int, alternate_sides: bool) -> ChunkResult:
+    """
+    Plays a chunk of games in the worker. The chunk is seeded separately,
+    so the results are the same no matter which worker plays it.
+    """
+    random.seed(seed)
+    first, second = _players
+    wins = draws = losses = moves = 0
+    for game in range(games):
+        first_sign = O_SIGN if alternate_sides and game % 2 else X_SIGN
+        x_player, o_player = (first, second) if first_sign == X_SIGN else (second, first)
+        winner, length = play_game(x_player, o_player)
+        moves += length
+        if winner is None:
+            draws += 1
+        elif winner == first_sign:
+            wins += 1
+        else:
+            losses += 1
+    return ChunkResult(wins, draws, losses, moves)
+
+
+def _play_chunk_args(args) -> ChunkResult:
+    return _play_chunk(*args)
+
+
+def simulate(first: PlayerConfig, second: PlayerConfig, games: int, workers: int = 0, seed: int = 0,
+             chunk_size: int = 10_000, alternate_sides: bool = False, shared_strategy: bool = False) -> SimulationReport:
+    """
+    Plays the games between the two players on a process pool. The first player plays with X
+    (or with X and O alternately if alternate_sides is set), and the results are counted from its point of view.
+    :param workers: number of worker processes, 0 means the number of CPUs. With 1 no pool is used.
+    :param shared_strategy: the computer strategy is published in shared memory once and the workers attach to it.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    chunks = [(seed + i, min(chunk_size, games - start), alternate_sides)
+              for i, start in enumerate(range(0, games, chunk_size))]
+    if "computer" in (first.strategy, second.strategy):
+        load_computer_strategy()  # the file is built here if it is missing, so the workers only map it
+    started = perf_counter()
+    if workers == 1:
+        _init_worker(first, second)
+        results = [_play_chunk(*chunk) for chunk in chunks]
+    elif shared_strategy and "computer" in (first.strategy, second.strategy):
+        from shared_strategy import SharedStrategyTable
+        with SharedStrategyTable.publish(Path(FILENAME)) as table:
+            with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(first, second, table.name)) as pool:
+                results = list(pool.imap_unordered(_play_chunk_args, chunks))
+    else:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(first, second)) as pool:
+            results = list(pool.imap_unordered(_play_chunk_args, chunks))
+    seconds = perf_counter() - started
+    totals = [sum(column) for column in zip(*results)]
+    return SimulationReport(games, *totals, seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plays games between two strategies without UI.")
+    parser.add_argument("first", type=PlayerConfig.parse, help="strategy:DIFFICULTY of the first player, e.g. computer:HARD (or computer:0.7 for a strength)")
+    parser.add_argument("second", type=PlayerConfig.parse, help="strategy:DIFFICULTY of the second player")
+    parser.add_argument("-n", "--games", type=int, default=100_000)
+    parser.add_argument("-w", "--workers", type=int, default=0, help="number of processes (default: number of CPUs)")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--alternate-sides", action="store_true", help="the players take X in turns")
+    parser.add_argument("--shared-strategy", action="store_true",
+                        help="publish the computer strategy in shared memory for the workers")
+    args = parser.parse_args(argv)
+    print(simulate(args.first, args.second, args.games, args.workers, args.seed, args.chunk_size, args.alternate_sides,
+                   args.shared_strategy))
+
+
+if __name__ == '__main__':
+    main()
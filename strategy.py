@@ -1,17 +1,27 @@
 import abc
-import pickle
-from collections import deque
+import argparse
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Future
 from enum import Enum
-from random import choice
+from math import exp
+from random import choice, random
+from time import perf_counter
 from typing import NamedTuple, Optional
 from pathlib import Path
+from array import array
+from bitboard import BitBoard, X_SIGN, O_SIGN, SIZE, CELLS, BOARD_COUNT, canonical_key, ternary_index, transform_key, \
+    key_of_ternary_index, SYMMETRIES, cells_of
 from game_play_state import GamePlayState
+from strategy_file import write_tables, open_tables, MOVE_MASK_TYPE, STRENGTH_INDEX_TYPE, STRENGTH_ENTRY_TYPE, \
+    StrategyFileError
 
 FILENAME = "computer.strategy"
 
-EMPTY_SIGN = "-"
-X_SIGN = "X"
-O_SIGN = "O"
+logger = logging.getLogger(__name__)
 
 
 class Difficulty(Enum):
@@ -20,6 +30,15 @@ class Difficulty(Enum):
     HARD = 3
 
 
+DIFFICULTY_COUNT = len(Difficulty)
+
+# The continuous strength (0.0: the worst moves, 0.5: random moves, 1.0: the best moves) is quantized to these levels
+STRENGTH_LEVELS = 11
+STRENGTH_SLOTS = STRENGTH_LEVELS * CELLS  # alias table entries per strength table
+# The inverse temperature of the move distribution at strength 0.9 is 0.8 * STRENGTH_SHARPNESS (see move_distribution)
+STRENGTH_SHARPNESS = 6.0
+
+
 class Strategy(abc.ABC):
     """
     This is the base class for the different strategies used by the ComputerPlayer
@@ -34,7 +53,7 @@ class BasicStrategy(Strategy):
     The basic strategy will always yield the next available field as the step of the computer opponent
     """
     def step(self, board: GamePlayState.GameBoard, sign: str, difficulty: Difficulty) -> tuple[int, int]:
-        return next((move for (move, val) in board.items() if val is None))
+        return divmod(board.empty_cells()[0], SIZE)
 
 
 class Winner(Enum):
@@ -47,178 +66,448 @@ class Winner(Enum):
     BOTH = "BOTH"
 
 
+# Winners stored as bytes in the strategy table. The byte value is the index in this tuple.
+WINNERS: tuple[Winner, ...] = tuple(Winner)
+WINNER_CODES: dict[Winner, int] = {w: i for i, w in enumerate(WINNERS)}
+
+
+class Outcome(NamedTuple):
+    """
+    The solved value of a position: who wins and in how many moves the game ends
+    if the winner plays for the fastest win and the loser for the longest resistance.
+    """
+    winner: Winner
+    depth: int
+
+
+def strength_level(strength: float) -> int:
+    return min(STRENGTH_LEVELS - 1, max(0, round(strength * (STRENGTH_LEVELS - 1))))
+
+
+def move_score(outcome: Outcome, sign: str) -> float:
+    """
+    The value of a move leading to the outcome for the player with the sign:
+    wins are above 1 (the faster the better), draws are 0, losses are below -1 (the slower the better).
+    """
+    if outcome.winner == Winner.BOTH:
+        return 0.0
+    speed = (CELLS - outcome.depth) / (2 * CELLS)
+    return 1 + speed if outcome.winner.value == sign else -1 - speed
+
+
+def move_distribution(scores: Sequence[float], level: int) -> list[float]:
+    """
+    The probabilities of the moves with the given scores on the strength level: a softmax of the scores
+    whose inverse temperature goes from negative (preferring the worst moves) through 0 (uniform) to positive.
+    The lowest and the highest level choose only from the worst and from the best moves.
+    """
+    if level in (0, STRENGTH_LEVELS - 1):
+        target = max(scores) if level else min(scores)
+        weights = [float(score == target) for score in scores]
+    else:
+        beta = (2 * level / (STRENGTH_LEVELS - 1) - 1) * STRENGTH_SHARPNESS
+        top = max(beta * score for score in scores)
+        weights = [exp(beta * score - top) for score in scores]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+
+def alias_table(probabilities: Sequence[float]) -> list[int]:
+    """
+    Builds a Walker alias table (with Vose's method) for sampling index i with probabilities[i].
+    Entry i is threshold << 8 | alias: index i is kept with probability threshold / 255, otherwise alias is taken.
+    """
+    n = len(probabilities)
+    scaled = [p * n for p in probabilities]
+    thresholds = [1.0] * n
+    aliases = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        thresholds[s], aliases[s] = scaled[s], l
+        scaled[l] -= 1 - scaled[s]
+        (small if scaled[l] < 1 else large).append(l)
+    return [round(t * 255) << 8 | a for t, a in zip(thresholds, aliases)]
+
+
 class StrategyNode:
     """
     This class represents a node in the gamestate graph. (e.g. the initial node is the empty field with the X being on turn.)
     The children of a node are the gamestates that are reachable from the
     current one. (e.g. from the initial node all nodes that have only one X are children.)
-    The key is the string representation of the board. The strategy represents which player can win from this state.
+    The key is the BitBoard key of the board. The strategy represents which player can win from this state,
+    the depth is the number of moves until the end of the game (see Outcome).
+    There are many nodes, so they have no __dict__ (see also strategy_graph.CompactStrategyGraph).
     """
-    def __init__(self, key: str, children: list[str], on_turn: str, strategy: Winner = Winner.UNKNOWN):
-        self.key: str = key
-        self.children: list[str] = children
+    __slots__ = ("key", "children", "on_turn", "strategy", "depth")
+
+    def __init__(self, key: int, children: list[int], on_turn: str, strategy: Winner = Winner.UNKNOWN,
+                 depth: int = 0):
+        self.key: int = key
+        self.children: list[int] = children
         self.on_turn = on_turn
         self.strategy: Winner = strategy
+        self.depth: int = depth
 
 
 class ComputerStrategy(Strategy):
     """
-    This strategy will choose step based on the strategy graph (data) and difficulty.
+    This strategy will choose step based on the solved strategy tables and difficulty.
+    The values table holds the code of the Winner (see WINNER_CODES) for every board indexed by its ternary_index,
+    the depths table holds the depth of the Outcome in the same order.
+    The moves table holds the candidate moves of every board for every difficulty as 9-bit masks
+    (DIFFICULTY_COUNT masks per board, in the order of the Difficulty values).
+    The strength tables hold an alias table for every strength level (CELLS entries per level, see alias_table)
+    over the empty cells of a board. Many boards have the same table, so only the distinct tables are stored
+    (STRENGTH_SLOTS entries each), and the strength index holds the number of the table of every board.
+    The tables can be any sequences (e.g. bytearray/array or views of a memory mapped file).
     """
-    def __init__(self, data: dict[str, StrategyNode]):
-        self.data: dict[str, StrategyNode] = data
+    def __init__(self, values: Sequence[int], depths: Sequence[int], moves: Sequence[int],
+                 strength_index: Sequence[int], strength_tables: Sequence[int]):
+        self.values: Sequence[int] = values
+        self.depths: Sequence[int] = depths
+        self.moves: Sequence[int] = moves
+        self.strength_index: Sequence[int] = strength_index
+        self.strength_tables: Sequence[int] = strength_tables
+
+    def winner(self, key: int) -> Winner:
+        return WINNERS[self.values[ternary_index(key)]]
+
+    def outcome(self, key: int) -> Outcome:
+        index = ternary_index(key)
+        return Outcome(WINNERS[self.values[index]], self.depths[index])
+
+    def query(self, keys: Iterable[int]) -> list[Outcome]:
+        """
+        Returns the Outcome of every position (BitBoard key) in the list.
+        (See batch_eval.solve for the same on numpy arrays of boards.)
+        """
+        values, depths = self.values, self.depths
+        return [Outcome(WINNERS[values[i]], depths[i]) for i in map(ternary_index, keys)]
 
     def step(self, board: GamePlayState.GameBoard, sign: str, difficulty: Difficulty) -> tuple[int, int]:
         """
-        This method will choose the next step of the computer player based on the current board, the strategy graph and difficulty.
-        The difficulty defines how the next step will be chosen. On HARD the children are filtered only for the best possible scenario.
-        On MEDIUM difficulty natural choices are also possible. On EASY the strategy chooses actually randomly.
+        This method will choose the next step of the computer player based on the current board and difficulty.
+        The candidate moves are precomputed by the ComputerStrategyBuilder, so it is a lookup and a random choice.
+        The sign is always the sign on turn, which is determined by the board.
         """
-        def choose_from_possibilities(*, best, natural, worst):
-            if len(best):
-                return choice(best)
-            elif len(natural):
-                return choice(natural)
-            else:
-                return choice(worst)
-
-        state = self.create_state_from_board(board)
-        next_states = self.compute_next_states(state, sign)
-        x_winners = [next_states[n] for n in next_states if self.data[n].strategy == Winner.X]
-        o_winners = [next_states[n] for n in next_states if self.data[n].strategy == Winner.O]
-        both_winners = [next_states[n] for n in next_states if self.data[n].strategy == Winner.BOTH]
-
-        if sign == X_SIGN:
-            if difficulty == Difficulty.HARD:
-                return choose_from_possibilities(best=x_winners, natural=both_winners, worst=o_winners)
-            elif difficulty == Difficulty.MEDIUM:
-                not_loosing = [*x_winners, *both_winners, *o_winners]
-                return choose_from_possibilities(best=[], natural=not_loosing, worst=[])
-            else:
-                return choose_from_possibilities(best=o_winners, natural=both_winners, worst=x_winners)
-
-        if sign == O_SIGN:
-            if difficulty == Difficulty.HARD:
-                return choose_from_possibilities(best=o_winners, natural=both_winners, worst=x_winners)
-            elif difficulty == Difficulty.MEDIUM:
-                not_loosing = [*x_winners, *both_winners, *o_winners]
-                return choose_from_possibilities(best=[], natural=not_loosing, worst=[])
-            else:
-                return choose_from_possibilities(best=x_winners, natural=both_winners, worst=o_winners)
+        mask = self.moves[ternary_index(board.key) * DIFFICULTY_COUNT + difficulty.value - 1]
+        return divmod(choice(cells_of(mask)), SIZE)
+
+    def step_at_strength(self, board: GamePlayState.GameBoard, strength: float) -> tuple[int, int]:
+        """
+        Chooses the next step on the continuous strength scale (0.0 worst, 0.5 random, 1.0 best, see STRENGTH_LEVELS)
+        from the precomputed distribution of the moves: one lookup in the alias table and one random number.
+        """
+        cells = board.empty_cells()
+        u = random() * len(cells)
+        i = int(u)
+        table = self.strength_index[ternary_index(board.key)]
+        entry = self.strength_tables[(table * STRENGTH_LEVELS + strength_level(strength)) * CELLS + i]
+        return divmod(cells[i if (u - i) * 255 < entry >> 8 else entry & 0xFF], SIZE)
+
 
-    def create_state_from_board(self, board: GamePlayState.GameBoard):
-        signs = [board[(r, c)] for r in range(3) for c in range(3)]
-        converted_signs = [x if x == X_SIGN or x == O_SIGN else EMPTY_SIGN for x in signs]
-        return ''.join(converted_signs)
+class StrengthStrategy(Strategy):
+    """
+    Plays with a ComputerStrategy on a fixed strength (see ComputerStrategy.step_at_strength) instead of the difficulty.
+    """
+    def __init__(self, strategy: ComputerStrategy, strength: float):
+        self.strategy = strategy
+        self.strength = strength
 
-    def compute_next_states(self, state: str, sign: str) -> dict[str, tuple[int, int]]:
-        next_states = {}
-        for i in range(9):
-            if state[i] is EMPTY_SIGN:
-                s = [*state]
-                s[i] = sign
-                index = divmod(i, 3)
-                next_states[''.join(s)] = index
-        return next_states
+    def step(self, board: GamePlayState.GameBoard, sign: str, difficulty: Difficulty) -> tuple[int, int]:
+        return self.strategy.step_at_strength(board, self.strength)
 
 
 class ComputerStrategyBuilder:
     """
-    This class can build up, save and load a strategy graph to/from file.
+    This class can build up the strategy graph and save/load the solved strategy table to/from file.
+    The file is memory mapped on load, so loading is cheap and the table is shared between processes.
     """
     class GameOverState(NamedTuple):
         is_gameover: bool
         winner: Winner
 
-    def __init__(self, computer_strategy_file_path: str):
+    def __init__(self, computer_strategy_file_path: str = FILENAME, use_symmetry: bool = False):
         self.file = Path(computer_strategy_file_path)
+        self.use_symmetry = use_symmetry
 
-    def build(self) -> Strategy:
-        strategy = self.build_strategy()
-        with open(self.file, "wb+") as f:
-            pickle.dump(strategy, f)
+    def build(self, workers: int = 1) -> Strategy:
+        strategy = self.build_strategy(workers)
+        self.save(strategy)
         return strategy
 
+    def save(self, strategy: ComputerStrategy):
+        """
+        Writes the tables of the strategy into the strategy file.
+        """
+        write_tables(self.file, strategy.values, strategy.depths, strategy.moves, strategy.strength_index,
+                     strategy.strength_tables, STRENGTH_SLOTS)
+
     def load(self) -> Optional[ComputerStrategy]:
+        """
+        :return: the strategy from the file or None if the file does not exist.
+        :raises StrategyFileError: if the file is corrupt or has an incompatible version.
+        """
         if self.file.exists():
-            with open(self.file, "rb+") as f:
-                try:
-                    return pickle.load(f)
-                except:
-                    return None
+            return ComputerStrategy(*open_tables(self.file, BOARD_COUNT, DIFFICULTY_COUNT, STRENGTH_SLOTS))
         else:
             return None
 
-    def build_strategy(self) -> ComputerStrategy:
+    def load_or_build(self, workers: int = 1) -> ComputerStrategy:
+        """
+        Loads the strategy from the file, or builds and saves it if the file is missing, corrupt or outdated.
+        """
+        try:
+            if strategy := self.load():
+                return strategy
+            logger.warning("%s is missing, building it", self.file)
+        except StrategyFileError as e:
+            logger.warning("%s, rebuilding it", e)
+        strategy = self.build_strategy(workers)
+        try:
+            self.save(strategy)
+        except OSError as e:
+            logger.warning("Cannot save %s: %s", self.file, e)
+        return strategy
+
+    def build_strategy(self, workers: int = 1) -> ComputerStrategy:
         """
         This method builds up the strategy graph
+        :param workers: with more than 1 worker the move and strength tables are built by create_tables_parallel
         :return: the strategy graph
         """
-        states_to_evaluate = [[EMPTY_SIGN] * 9]
+        states_to_evaluate = [BitBoard()]
         computed_state_graph = self.compute_states_with_children(states_to_evaluate)
         computed_strategy_graph = self.compute_strategy_with_children(computed_state_graph)
-        return ComputerStrategy(computed_strategy_graph)
+        values, depths = self.create_value_tables(computed_strategy_graph)
+        if workers > 1:
+            moves, (strength_index, strength_tables) = self.create_tables_parallel(values, depths, workers)
+        else:
+            moves = self.create_move_table(values, depths)
+            strength_index, strength_tables = self.create_strength_table(values, depths)
+        return ComputerStrategy(values, depths, moves, strength_index, strength_tables)
 
-    def compute_states_with_children(self, states_to_evaluate: list[list[str]]) -> list[StrategyNode]:
+    @staticmethod
+    def create_tables_parallel(values: bytes, depths: bytes, workers: int, chunks_per_worker: int = 4) \
+            -> tuple[array, tuple[array, array]]:
+        """
+        Creates the move and the strength tables on a process pool. These take most of the build time
+        (the graph is small, it is solved before in one pass), and every board is independent of the others:
+        the range of the board indexes is split into chunks, the workers create the rows of their chunks
+        from the value and depth tables (sent to them once), and the chunks are concatenated in order.
+        The strength tables of the chunks are merged, so every distinct table is stored once.
+        """
+        chunk = -(-BOARD_COUNT // (workers * chunks_per_worker))
+        ranges = [(start, min(start + chunk, BOARD_COUNT)) for start in range(0, BOARD_COUNT, chunk)]
+        moves, strength_index, strength_tables = array(MOVE_MASK_TYPE), array(STRENGTH_INDEX_TYPE), \
+            array(STRENGTH_ENTRY_TYPE)
+        table_numbers: dict[bytes, int] = {}
+
+        def add_table(table: array) -> int:
+            number = table_numbers.setdefault(table.tobytes(), len(table_numbers))
+            if number * STRENGTH_SLOTS == len(strength_tables):
+                strength_tables.extend(table)
+            return number
+
+        with multiprocessing.Pool(workers, _init_table_worker, (bytes(values), bytes(depths))) as pool:
+            chunks = pool.imap(_create_table_rows, ranges)
+            for (start, _), (chunk_moves, (chunk_index, chunk_tables)) in zip(ranges, chunks):
+                moves.extend(chunk_moves)
+                numbers = [add_table(chunk_tables[offset:offset + STRENGTH_SLOTS])
+                           for offset in range(0, len(chunk_tables), STRENGTH_SLOTS)]
+                strength_index.extend(numbers[n] if depths[i] else 0 for i, n in enumerate(chunk_index, start))
+        return moves, (strength_index, strength_tables)
+
+    def compute_states_with_children(self, states_to_evaluate: list[BitBoard],
+                                     node_class: Callable[..., StrategyNode] = StrategyNode) -> list[StrategyNode]:
         """
         This method creates a list of strategy nodes which represent a possible state of the game.
 
-        The algorithm pops one node from a queue and creates its children which are added to the queue as well.
+        The algorithm pops one node from a stack and creates its children. The children which were not visited yet
+        are pushed to the stack as well, so every position gets exactly one node.
+        With symmetry turned on the positions are identified by their canonical key,
+        so only one of the rotated/reflected variants of a position is stored.
         "game over" nodes are marked with the winner.
-        The algorithm stops when queue becomes empty.
+        The algorithm stops when the stack becomes empty.
         :param states_to_evaluate: The list of initial nodes. This should be a list with the initial node.
+        :param node_class: creates the nodes (with the arguments of StrategyNode)
         """
         computed_states = []
+        visited = {self.node_key(s) for s in states_to_evaluate}
+        states_to_evaluate = [BitBoard.from_key(k) for k in visited]
         while len(states_to_evaluate):
             state = states_to_evaluate.pop()
-            children = []
-            sign = X_SIGN if state.count(X_SIGN) == state.count(O_SIGN) else O_SIGN
-            state_key = ''.join(state)
-            gameover_state = self.gameover_state(state_key)
+            children_keys = []
+            sign = state.on_turn()
+            gameover_state = self.gameover_state(state)
             if not gameover_state.is_gameover:
-                for i in range(0, 9):
-                    s = state.copy()  # for not overwriting the state
-                    if s[i] == EMPTY_SIGN:
-                        s[i] = sign
-                        states_to_evaluate.append(s)
-                        children.append(s)
-
-            children_keys = [''.join(c) for c in children]
-            computed_states.append(StrategyNode(state_key, children_keys, sign, gameover_state.winner))
+                for i in state.empty_cells():
+                    child_key = self.node_key(state.with_sign(i, sign))
+                    if child_key in visited:
+                        if child_key not in children_keys:
+                            children_keys.append(child_key)
+                        continue
+                    visited.add(child_key)
+                    children_keys.append(child_key)
+                    states_to_evaluate.append(BitBoard.from_key(child_key))
+
+            computed_states.append(node_class(state.key, children_keys, sign, gameover_state.winner))
         return computed_states
 
+    def node_key(self, board: BitBoard) -> int:
+        return canonical_key(board.key) if self.use_symmetry else board.key
+
     def compute_strategy_with_children(self, computed_state_graph: list[StrategyNode]):
         """
-        This method calculates the potential winners in the intermediate game states of the state graph
-        The method uses a deque to keep track of the nodes to be evaluated. If a node has UNKNOWN strategy
-        the strategy is calculated from its children (if they are already have). If the children also require calculation
-        they are pushed to the deque.
-        The algorithm stops once the deque is empty.
+        This method calculates the potential winners (and the depths) in the intermediate game states of the state graph
+        Every child of a node has exactly one more sign on the board than the node itself.
+        So the nodes are grouped by the number of signs on the board and the groups are evaluated
+        from the full boards towards the empty one. When a node is evaluated all its children already have strategy,
+        so every node is calculated exactly once and the running time is linear in the size of the graph.
         :param computed_state_graph: the already built state graph that only needs strategy evaluation in the nodes.
         :return: A state graph that has an evaluated strategy for all nodes.
         """
-        strategy_graph: dict[str, StrategyNode] = {g.key: g for g in computed_state_graph}
-        nodes_to_calculate: deque[StrategyNode] = deque([strategy_graph[EMPTY_SIGN * 9]])
-        while len(nodes_to_calculate):
-            node = nodes_to_calculate.popleft()
-            if node.strategy is not Winner.UNKNOWN:  # the node has strategy already
-                continue
-            key = node.key
-            children = strategy_graph[key].children
-            children_strategies = [strategy_graph[c].strategy for c in children]
-
-            if all([x is not Winner.UNKNOWN for x in children_strategies]):
-                strategy = self.calculate_strategy_from_children(children_strategies, node.on_turn)
-                strategy_graph[key].strategy = strategy
-            else:
-                for c in children:
-                    if c not in nodes_to_calculate:
-                        nodes_to_calculate.appendleft(
-                            strategy_graph[c])  # calculating children of the current node must be done first
-                if node not in nodes_to_calculate:
-                    nodes_to_calculate.append(node)  # Need to recalculate current node later
+        strategy_graph: dict[int, StrategyNode] = {g.key: g for g in computed_state_graph}
+        nodes_by_sign_count: list[list[StrategyNode]] = [[] for _ in range(CELLS + 1)]
+        for node in strategy_graph.values():
+            nodes_by_sign_count[node.key.bit_count()].append(node)
+
+        for nodes in reversed(nodes_by_sign_count):
+            for node in nodes:
+                if node.strategy is not Winner.UNKNOWN:  # game over nodes have strategy already
+                    continue
+                children_outcomes = [Outcome(strategy_graph[c].strategy, strategy_graph[c].depth) for c in node.children]
+                node.strategy, node.depth = self.calculate_outcome_from_children(children_outcomes, node.on_turn)
         return strategy_graph
 
+    def board_keys(self, key: int) -> set[int]:
+        """
+        :return: the keys of the boards represented by the node key. (All the variants in case of symmetry.)
+        """
+        if not self.use_symmetry:
+            return {key}
+        return {transform_key(key, symmetry) for symmetry in range(len(SYMMETRIES))}
+
+    def create_value_tables(self, strategy_graph: dict[int, StrategyNode]) -> tuple[bytearray, bytearray]:
+        """
+        Creates the dense value and depth tables from the solved graph.
+        """
+        values = bytearray(BOARD_COUNT)
+        depths = bytearray(BOARD_COUNT)
+        for key, node in strategy_graph.items():
+            code = WINNER_CODES[node.strategy]
+            for board_key in self.board_keys(key):
+                index = ternary_index(board_key)
+                values[index] = code
+                depths[index] = node.depth
+        return values, depths
+
+    @staticmethod
+    def playable_boards(depths: bytes, start: int = 0, stop: int = BOARD_COUNT) -> Iterable[tuple[int, BitBoard]]:
+        """
+        :return: the indexes and the boards in the index range that are reachable and not game over
+        (their depth is positive, game over and unreachable boards have depth 0)
+        """
+        for index in range(start, stop):
+            if depths[index]:
+                yield index, BitBoard.from_key(key_of_ternary_index(index))
+
+    def create_move_table(self, values: bytes, depths: bytes, start: int = 0, stop: int = BOARD_COUNT) -> array:
+        """
+        Creates the dense move table (of the boards in the index range). For every board that is not game over
+        and for every difficulty it stores the mask of the cells the computer may choose from.
+        The difficulty defines how the candidates are chosen. On HARD the children are filtered only for the best possible scenario
+        (the fastest win, or the longest resistance if the game is lost).
+        On MEDIUM difficulty natural choices are also possible. On EASY the strategy chooses actually randomly.
+        """
+        def outcome_of(k: int) -> Outcome:
+            index = ternary_index(k)
+            return Outcome(WINNERS[values[index]], depths[index])
+
+        moves = array(MOVE_MASK_TYPE, bytes((stop - start) * DIFFICULTY_COUNT * array(MOVE_MASK_TYPE).itemsize))
+        for index, board in self.playable_boards(depths, start, stop):
+            offset = (index - start) * DIFFICULTY_COUNT
+            candidates = self.compute_candidate_moves(board, board.on_turn(), outcome_of)
+            for difficulty, mask in candidates.items():
+                moves[offset + difficulty.value - 1] = mask
+        return moves
+
+    def create_strength_table(self, values: bytes, depths: bytes, start: int = 0, stop: int = BOARD_COUNT) \
+            -> tuple[array, array]:
+        """
+        Creates the strength index (of the boards in the index range) and the distinct strength tables.
+        For every board that is not game over the empty cells are scored by the outcome of the move (see move_score),
+        and an alias table of their distribution is created for every strength level. Many boards have the same
+        scores (or the same tables), so every distinct table is stored once and the boards refer to it by its number.
+        """
+        strength_index = array(STRENGTH_INDEX_TYPE, bytes((stop - start) * array(STRENGTH_INDEX_TYPE).itemsize))
+        strength_tables = array(STRENGTH_ENTRY_TYPE)
+        numbers_by_scores: dict[tuple[float, ...], int] = {}
+        numbers_by_table: dict[bytes, int] = {}
+        for index, board in self.playable_boards(depths, start, stop):
+            sign = board.on_turn()
+            scores = []
+            for i in board.empty_cells():
+                child = ternary_index(board.with_sign(i, sign).key)
+                scores.append(move_score(Outcome(WINNERS[values[child]], depths[child]), sign))
+            scores = tuple(scores)
+            if (number := numbers_by_scores.get(scores)) is None:
+                table = array(STRENGTH_ENTRY_TYPE)
+                for level in range(STRENGTH_LEVELS):
+                    entries = alias_table(move_distribution(scores, level))
+                    table.extend(entries + [0] * (CELLS - len(entries)))
+                number = numbers_by_scores[scores] = numbers_by_table.setdefault(table.tobytes(), len(numbers_by_table))
+                if number == len(strength_tables) // STRENGTH_SLOTS:
+                    strength_tables.extend(table)
+            strength_index[index - start] = number
+        return strength_index, strength_tables
+
+    def compute_candidate_moves(self, board: BitBoard, sign: str,
+                                outcome_of: Callable[[int], Outcome]) -> dict[Difficulty, int]:
+        """
+        :param outcome_of: returns the Outcome of a board by its key
+        :return: the mask of the cells the computer may choose from for every difficulty
+        """
+        def choose_from_possibilities(*, best, natural, worst):
+            return best or natural or worst
+
+        def with_depth(cells: int, select: Callable[[list[int]], int]) -> int:
+            depth = select([depths[i] for i in cells_of(cells)])
+            return sum(1 << i for i in cells_of(cells) if depths[i] == depth)
+
+        x_winners = o_winners = both_winners = 0
+        depths = [0] * CELLS
+        for i in board.empty_cells():
+            winner, depths[i] = outcome_of(board.with_sign(i, sign).key)
+            if winner == Winner.X:
+                x_winners |= 1 << i
+            elif winner == Winner.O:
+                o_winners |= 1 << i
+            elif winner == Winner.BOTH:
+                both_winners |= 1 << i
+
+        own_winners, opponent_winners = (x_winners, o_winners) if sign == X_SIGN else (o_winners, x_winners)
+        not_loosing = x_winners | both_winners | o_winners
+        fastest_wins = own_winners and with_depth(own_winners, min)
+        slowest_losses = opponent_winners and with_depth(opponent_winners, max)
+        return {
+            Difficulty.HARD: choose_from_possibilities(best=fastest_wins, natural=both_winners, worst=slowest_losses),
+            Difficulty.MEDIUM: choose_from_possibilities(best=0, natural=not_loosing, worst=0),
+            Difficulty.EASY: choose_from_possibilities(best=opponent_winners, natural=both_winners, worst=own_winners),
+        }
+
+    def calculate_outcome_from_children(self, children_outcomes: list[Outcome], on_turn: str) -> Outcome:
+        """
+        The winner is calculated from the winners of the children. The depth is one more than the depth of
+        the fastest winning child if the player on turn wins, otherwise of the slowest child with the same winner.
+        """
+        strategy = self.calculate_strategy_from_children([o.winner for o in children_outcomes], on_turn)
+        depths = [o.depth for o in children_outcomes if o.winner is strategy]
+        own = Winner.X if on_turn == X_SIGN else Winner.O
+        return Outcome(strategy, 1 + (min(depths) if strategy is own else max(depths)))
+
     def calculate_strategy_from_children(self, children_strategies: list[Winner], on_turn: str):
         x_win_strategy = any([s is Winner.X for s in children_strategies])
         o_win_strategy = any([s is Winner.O for s in children_strategies])
@@ -242,45 +531,135 @@ class ComputerStrategyBuilder:
             else:
                 return Winner.O
 
-    def gameover_state(self, board: str) -> GameOverState:
+    def gameover_state(self, board: BitBoard) -> GameOverState:
         """
         Determines whether the current board is a game over state. (either a player wins or the board is full)
         :return A GameOverState that has boolean (whether is a gameover state or not) and an optional winner.
         """
-        def board_is_full():
-            return board.count(EMPTY_SIGN) == 0
+        winner = board.winner()
+        if winner == X_SIGN:
+            return ComputerStrategyBuilder.GameOverState(True, Winner.X)
+        if winner == O_SIGN:
+            return ComputerStrategyBuilder.GameOverState(True, Winner.O)
+        if board.is_full():
+            return ComputerStrategyBuilder.GameOverState(True, Winner.BOTH)
+        return ComputerStrategyBuilder.GameOverState(False, Winner.UNKNOWN)
 
-        def has_sign_on_indexes(sign: str, i0: int, i1: int, i2: int):
-            return board[i0] == sign \
-                   and board[i1] == sign \
-                   and board[i2] == sign
 
-        def does_win(sign: str) -> str:
-            def signs_in_a_row():
-                return has_sign_on_indexes(sign, 0, 1, 2) \
-                       or has_sign_on_indexes(sign, 3, 4, 5) \
-                       or has_sign_on_indexes(sign, 6, 7, 8)
+_worker_tables: Optional[tuple[bytes, bytes]] = None
 
-            def signs_in_a_column():
-                return has_sign_on_indexes(sign, 0, 3, 6) \
-                       or has_sign_on_indexes(sign, 1, 4, 7) \
-                       or has_sign_on_indexes(sign, 2, 5, 8)
 
-            def signs_in_a_diagonal():
-                return has_sign_on_indexes(sign, 0, 4, 8) \
-                       or has_sign_on_indexes(sign, 2, 4, 6)
+def _init_table_worker(values: bytes, depths: bytes):
+    global _worker_tables
+    _worker_tables = (values, depths)
 
-            wins = signs_in_a_row() or signs_in_a_column() or signs_in_a_diagonal()
-            return sign if wins else None
 
-        if does_win(X_SIGN):
-            return ComputerStrategyBuilder.GameOverState(True, Winner.X)
-        if does_win(O_SIGN):
-            return ComputerStrategyBuilder.GameOverState(True, Winner.O)
-        if board_is_full():
-            return ComputerStrategyBuilder.GameOverState(True, Winner.BOTH)
-        return ComputerStrategyBuilder.GameOverState(False, Winner.UNKNOWN)
+def _create_table_rows(index_range: tuple[int, int]) -> tuple[array, array]:
+    """
+    Creates the rows of the move and the strength table in a worker process of create_tables_parallel.
+    """
+    builder = ComputerStrategyBuilder()
+    return builder.create_move_table(*_worker_tables, *index_range), \
+        builder.create_strength_table(*_worker_tables, *index_range)
+
+
+class LazyStrategy(Strategy):
+    """
+    This strategy plays like the ComputerStrategy but it doesn't need a prebuilt file.
+    The positions are solved on demand when they are reached in a game (with the rules of the ComputerStrategyBuilder),
+    and the results are memoized in a bounded LRU cache. The first move from the empty board solves the whole game,
+    which takes a fraction of a second. The hits and misses of the cache are counted.
+    """
+    def __init__(self, cache_size: int = 4096, use_symmetry: bool = True):
+        self.builder = ComputerStrategyBuilder(use_symmetry=use_symmetry)
+        self.cache_size = cache_size
+        self.cache: OrderedDict[int, Outcome] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def step(self, board: GamePlayState.GameBoard, sign: str, difficulty: Difficulty) -> tuple[int, int]:
+        candidates = self.builder.compute_candidate_moves(board, sign, self.outcome)
+        return divmod(choice(cells_of(candidates[difficulty])), SIZE)
+
+    def winner(self, key: int) -> Winner:
+        return self.outcome(key).winner
+
+    def outcome(self, key: int) -> Outcome:
+        node_key = self.builder.node_key(BitBoard.from_key(key))
+        if (outcome := self.cache.get(node_key)) is not None:
+            self.hits += 1
+            self.cache.move_to_end(node_key)
+            return outcome
+
+        self.misses += 1
+        board = BitBoard.from_key(node_key)
+        gameover_state = self.builder.gameover_state(board)
+        if gameover_state.is_gameover:
+            outcome = Outcome(gameover_state.winner, 0)
+        else:
+            sign = board.on_turn()
+            children_outcomes = [self.outcome(board.with_sign(i, sign).key) for i in board.empty_cells()]
+            outcome = self.builder.calculate_outcome_from_children(children_outcomes, sign)
+
+        self.cache[node_key] = outcome
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return outcome
+
+
+class BackgroundStrategy(Strategy):
+    """
+    Loads a strategy on a background thread, so the program can start before the strategy is ready.
+    The steps wait until the loading finishes (and raise its exception if it failed).
+    The thread is not a daemon, so a strategy which is being rebuilt is still saved if the program exits meanwhile.
+    """
+    def __init__(self, load: Callable[[], Strategy]):
+        self.future: Future = Future()
+        self.started = perf_counter()
+        self.seconds: Optional[float] = None  # the time of the loading once it is finished
+        threading.Thread(target=self.run, args=(load,), name="strategy-loader").start()
+
+    def run(self, load: Callable[[], Strategy]):
+        try:
+            strategy = load()
+        except BaseException as e:
+            self.seconds = perf_counter() - self.started
+            self.future.set_exception(e)
+            return
+        self.seconds = perf_counter() - self.started
+        self.future.set_result(strategy)
+
+    def strategy(self, timeout: Optional[float] = None) -> Strategy:
+        return self.future.result(timeout)
+
+    def step(self, board: GamePlayState.GameBoard, sign: str, difficulty: Difficulty) -> tuple[int, int]:
+        return self.strategy().step(board, sign, difficulty)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds the strategy file.")
+    parser.add_argument("-f", "--file", default=FILENAME, help=f"strategy file (default: {FILENAME})")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="build on a process pool with this many workers")
+    parser.add_argument("--no-symmetry", action="store_true", help="don't reduce the positions by symmetry")
+    parser.add_argument("--speedup", action="store_true",
+                        help="also build serially, check that the results are identical and print the speedup")
+    args = parser.parse_args(argv)
+
+    builder = ComputerStrategyBuilder(args.file, use_symmetry=not args.no_symmetry)
+    started = perf_counter()
+    strategy = builder.build(args.workers)
+    seconds = perf_counter() - started
+    print(f"Built {args.file} in {seconds:.3f} s with {args.workers} worker(s)")
+    if args.speedup:
+        started = perf_counter()
+        serial = builder.build_strategy()
+        serial_seconds = perf_counter() - started
+        identical = (bytes(serial.values) == bytes(strategy.values) and bytes(serial.depths) == bytes(strategy.depths)
+                     and serial.moves == strategy.moves and serial.strength_index == strategy.strength_index
+                     and serial.strength_tables == strategy.strength_tables)
+        print(f"Serial build took {serial_seconds:.3f} s, speedup: {serial_seconds / seconds:.2f}x, "
+              f"identical: {identical}")
 
 
 if __name__ == '__main__':
-    ComputerStrategyBuilder(FILENAME).build()
+    main()
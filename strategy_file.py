@@ -0,0 +1,140 @@
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+
+MAGIC = b"TTTS"
+VERSION = 5
+
+# magic, version, number of boards, number of move masks per board, number of entries of a strength table,
+# number of strength tables, crc32 checksum of the tables
+HEADER = struct.Struct("<4sHxxIIIII")
+MOVE_MASK_TYPE = "H"  # move masks are stored as little-endian uint16
+STRENGTH_INDEX_TYPE = "H"  # the strength table of every board is stored as a little-endian uint16 index
+STRENGTH_ENTRY_TYPE = "H"  # alias table entries are stored as little-endian uint16
+
+
+class StrategyFileError(Exception):
+    """
+    Raised when a strategy file is corrupt or was written by an incompatible version.
+    """
+
+
+def write_tables(path: Path, values: bytes, depths: bytes, moves: array, strength_index: array,
+                 strength_tables: array, strength_slots: int):
+    """
+    Writes the value table and the depth table (one byte per board each), the move table (move masks per board),
+    the strength index (the number of the strength table of every board) and the distinct strength tables
+    (strength_slots alias table entries each) into the file after a header.
+    The file is written into a temporary file first and then renamed, so readers never see a partially written file.
+    """
+    arrays = [array(MOVE_MASK_TYPE, moves), array(STRENGTH_INDEX_TYPE, strength_index),
+              array(STRENGTH_ENTRY_TYPE, strength_tables)]
+    if sys.byteorder == "big":
+        for a in arrays:
+            a.byteswap()
+    tables = [values, depths, *(a.tobytes() for a in arrays)]
+    checksum = 0
+    for table in tables:
+        checksum = zlib.crc32(table, checksum)
+    header = HEADER.pack(MAGIC, VERSION, len(values), len(moves) // len(values), strength_slots,
+                         len(strength_tables) // strength_slots, checksum)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for table in tables:
+            f.write(table)
+    tmp.replace(path)
+
+
+def read_header(path: Path) -> tuple[bytes, int, int, int, int, int, int]:
+    """
+    :return: the fields of the header (magic, version, board count, move slots, strength slots,
+    strength table count, checksum) of the file.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise StrategyFileError(f"{path} is too short")
+    return HEADER.unpack(header)
+
+
+def tables_size(board_count: int, move_slots: int, strength_slots: int, strength_tables: int) -> int:
+    """
+    :return: the size of the file (header and tables) with the given table sizes.
+    """
+    return HEADER.size + 2 * board_count + board_count * move_slots * array(MOVE_MASK_TYPE).itemsize \
+        + board_count * array(STRENGTH_INDEX_TYPE).itemsize \
+        + strength_tables * strength_slots * array(STRENGTH_ENTRY_TYPE).itemsize
+
+
+def contents_size(data: memoryview) -> int:
+    """
+    :return: the size of the strategy file contents at the beginning of the data according to its header
+    (the data can be longer, e.g. a shared memory block is rounded up to whole pages), or 0 if it has no header.
+    """
+    if len(data) < HEADER.size:
+        return 0
+    _, _, count, move_slots, strength_slots, strength_tables, _ = HEADER.unpack_from(data)
+    return tables_size(count, move_slots, strength_slots, strength_tables)
+
+
+Tables = tuple[memoryview, memoryview, memoryview, memoryview, memoryview]
+
+
+def open_tables(path: Path, board_count: int, move_slots: int, strength_slots: int) -> Tables:
+    """
+    Maps the file into memory and returns read-only views of the value, the depth, the move table,
+    the strength index and the strength tables after validating the header.
+    The pages are shared by all the processes mapping the same file.
+    """
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # empty file
+            raise StrategyFileError(f"{path} is empty") from e
+    return parse_tables(memoryview(mapped), str(path), board_count, move_slots, strength_slots)
+
+
+def parse_tables(data: memoryview, name: str, board_count: int, move_slots: int, strength_slots: int) -> Tables:
+    """
+    Validates the header of the strategy file contents and returns views of the value, the depth, the move table,
+    the strength index and the strength tables.
+    :param name: the name of the source in the error messages
+    """
+    if len(data) < HEADER.size:
+        raise StrategyFileError(f"{name} is too short")
+    magic, version, count, slots, strength_count, strength_tables, checksum = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise StrategyFileError(f"{name} is not a strategy file")
+    if version != VERSION:
+        raise StrategyFileError(f"{name} has version {version}, expected {VERSION}")
+    if count != board_count or slots != move_slots or strength_count != strength_slots \
+            or len(data) != tables_size(board_count, move_slots, strength_slots, strength_tables):
+        raise StrategyFileError(f"{name} has unexpected size")
+    data = data[HEADER.size:]
+    sizes = (board_count, board_count, board_count * move_slots * array(MOVE_MASK_TYPE).itemsize,
+             board_count * array(STRENGTH_INDEX_TYPE).itemsize)
+    tables = []
+    for size in sizes:
+        tables.append(data[:size])
+        data = data[size:]
+    tables.append(data)
+    computed = 0
+    for table in tables:
+        computed = zlib.crc32(table, computed)
+    if computed != checksum:
+        raise StrategyFileError(f"{name} has invalid checksum")
+    values, depths, moves, strength_index, strength_entries = tables
+    typecodes = (MOVE_MASK_TYPE, STRENGTH_INDEX_TYPE, STRENGTH_ENTRY_TYPE)
+    if sys.byteorder == "big":
+        return values, depths, *(_swapped(t, c) for t, c in zip((moves, strength_index, strength_entries), typecodes))
+    return values, depths, *(t.cast(c) for t, c in zip((moves, strength_index, strength_entries), typecodes))
+
+
+def _swapped(data: memoryview, typecode: str) -> memoryview:
+    swapped = array(typecode, data.tobytes())
+    swapped.byteswap()
+    return memoryview(swapped)
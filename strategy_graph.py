@@ -0,0 +1,158 @@
+import argparse
+import gc
+import os
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+from random import choice
+from typing import Optional
+
+from bitboard import BitBoard, SIZE, cells_of
+from game_play_state import GamePlayState
+from strategy import Strategy, StrategyNode, ComputerStrategyBuilder, Difficulty, Outcome, Winner, WINNERS, WINNER_CODES
+
+
+class CompactStrategyGraph:
+    """
+    The solved strategy graph in flat arrays instead of StrategyNode objects.
+    The nodes are addressed by integer ids: the position of their key in the sorted keys array.
+    The children of node i are children[offsets[i]:offsets[i + 1]] (compressed sparse row layout),
+    the winner codes (see WINNER_CODES) and the depths of the nodes are in bytearrays.
+    """
+    def __init__(self, keys: array, offsets: array, children: array, values: bytearray, depths: bytearray):
+        self.keys = keys
+        self.offsets = offsets
+        self.children = children
+        self.values = values
+        self.depths = depths
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[StrategyNode]) -> "CompactStrategyGraph":
+        nodes = sorted(nodes, key=lambda n: n.key)
+        keys = array("I", (node.key for node in nodes))
+        ids = {key: i for i, key in enumerate(keys)}
+        offsets = array("I", [0])
+        children = array("I")
+        for node in nodes:
+            children.extend(ids[c] for c in node.children)
+            offsets.append(len(children))
+        values = bytearray(WINNER_CODES[node.strategy] for node in nodes)
+        depths = bytearray(node.depth for node in nodes)
+        return cls(keys, offsets, children, values, depths)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def node_id(self, key: int) -> Optional[int]:
+        i = bisect_left(self.keys, key)
+        return i if i < len(self.keys) and self.keys[i] == key else None
+
+    def children_of(self, node_id: int) -> array:
+        return self.children[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def outcome(self, node_id: int) -> Outcome:
+        return Outcome(WINNERS[self.values[node_id]], self.depths[node_id])
+
+    def nbytes(self) -> int:
+        """
+        The size of the arrays of the graph.
+        """
+        return sum(a.itemsize * len(a) for a in (self.keys, self.offsets, self.children)) \
+            + len(self.values) + len(self.depths)
+
+
+class CompactGraphStrategy(Strategy):
+    """
+    Plays like the ComputerStrategy (with the rules of the ComputerStrategyBuilder) on a CompactStrategyGraph.
+    The graph must have been built with the same use_symmetry setting as the builder.
+    """
+    def __init__(self, graph: CompactStrategyGraph, builder: ComputerStrategyBuilder):
+        self.graph = graph
+        self.builder = builder
+
+    @classmethod
+    def build(cls, use_symmetry: bool = True) -> "CompactGraphStrategy":
+        builder = ComputerStrategyBuilder(use_symmetry=use_symmetry)
+        nodes = builder.compute_states_with_children([BitBoard()])
+        graph = CompactStrategyGraph.from_nodes(builder.compute_strategy_with_children(nodes).values())
+        return cls(graph, builder)
+
+    def outcome(self, key: int) -> Outcome:
+        return self.graph.outcome(self.graph.node_id(self.builder.node_key(BitBoard.from_key(key))))
+
+    def winner(self, key: int):
+        return self.outcome(key).winner
+
+    def step(self, board: GamePlayState.GameBoard, sign: str, difficulty: Difficulty) -> tuple[int, int]:
+        candidates = self.builder.compute_candidate_moves(board, sign, self.outcome)
+        return divmod(choice(cells_of(candidates[difficulty])), SIZE)
+
+
+def resident_memory() -> Optional[int]:
+    """
+    :return: the resident set size of the process in bytes (None where /proc is not available)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+class DictStrategyNode:
+    """
+    The StrategyNode as it was before it got __slots__ (its attributes are in a __dict__).
+    It is only used as the baseline of the memory report.
+    """
+    def __init__(self, key: int, children: list[int], on_turn: str, strategy: Winner = Winner.UNKNOWN,
+                 depth: int = 0):
+        self.key = key
+        self.children = children
+        self.on_turn = on_turn
+        self.strategy = strategy
+        self.depth = depth
+
+
+def memory_report(use_symmetry: bool = False):
+    """
+    Builds the solved graph of DictStrategyNode objects (the graph before StrategyNode got __slots__)
+    and of StrategyNode objects, converts the latter into a CompactStrategyGraph,
+    and prints the memory taken by each (allocated by Python and the change of the resident memory).
+    """
+    builder = ComputerStrategyBuilder(use_symmetry=use_symmetry)
+
+    def measure(create):
+        gc.collect()
+        rss_before = resident_memory()
+        tracemalloc.start()
+        result = create()
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_after = resident_memory()
+        return result, allocated, None if rss_before is None else rss_after - rss_before
+
+    def report(name: str, allocated: int, rss: Optional[int], note: str = ""):
+        print(f"{name:34} {allocated / 1024:9.1f} KiB allocated"
+              + (f", resident +{rss / 1024:.1f} KiB" if rss is not None else "") + note)
+
+    def build_graph(node_class):
+        return builder.compute_strategy_with_children(builder.compute_states_with_children([BitBoard()], node_class))
+
+    dict_graph, dict_allocated, dict_rss = measure(lambda: build_graph(DictStrategyNode))
+    del dict_graph
+    graph, graph_allocated, graph_rss = measure(lambda: build_graph(StrategyNode))
+    compact, compact_allocated, compact_rss = measure(lambda: CompactStrategyGraph.from_nodes(graph.values()))
+
+    print(f"nodes: {len(compact)}, edges: {len(compact.children)}")
+    report("StrategyNode graph with __dict__:", dict_allocated, dict_rss)
+    report("StrategyNode graph with __slots__:", graph_allocated, graph_rss)
+    report("CompactStrategyGraph:", compact_allocated, compact_rss, f" ({compact.nbytes() / 1024:.1f} KiB in arrays)")
+    print(f"ratio to the __dict__ graph: {dict_allocated / compact_allocated:.1f}x, "
+          f"to the __slots__ graph: {graph_allocated / compact_allocated:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares the memory of the object and the compact strategy graph.")
+    parser.add_argument("--symmetry", action="store_true", help="reduce the positions by symmetry")
+    memory_report(parser.parse_args().symmetry)
@@ -0,0 +1,40 @@
+from game_record import GameRecorder, FILE_HEADER, RECORD, read_games, read_records, GAME_START, MOVE, GAME_END
+from strategy import Difficulty
+
+import pytest
+
+
+def record_game(recorder: GameRecorder, cells: list[int]) -> int:
+    game_id = recorder.start_game(Difficulty.HARD.value, "X")
+    for i, cell in enumerate(cells):
+        recorder.record_move(game_id, divmod(cell, 3), "XO"[i % 2])
+    recorder.end_game(game_id, "X")
+    return game_id
+
+
+def test_append_after_torn_tail(tmp_path):
+    path = tmp_path / "games.log"
+    recorder = GameRecorder(path)
+    first = record_game(recorder, [4, 0, 2])
+    recorder.close()
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(MOVE, first, 0.0, 8, 1)[:7])  # a record torn by a crash
+
+    recorder = GameRecorder(path)
+    second = record_game(recorder, [0, 4])
+    recorder.close()
+
+    assert (path.stat().st_size - FILE_HEADER.size) % RECORD.size == 0
+    assert second == first + 1
+    assert {r.kind for r in read_records(path)} == {GAME_START, MOVE, GAME_END}
+    games = list(read_games(path))
+    assert [g.game_id for g in games] == [first, second]
+    assert [cell for cell, _ in games[1].moves] == [0, 4]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.log"
+    path.write_bytes(b"not a log at all")
+    with pytest.raises(ValueError):
+        GameRecorder(path)
+    assert path.read_bytes() == b"not a log at all"
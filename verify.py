@@ -0,0 +1,243 @@
+import argparse
+import random
+import sys
+from collections.abc import Callable, Iterator
+from time import perf_counter
+from typing import NamedTuple, Optional
+
+from bitboard import BitBoard, SIZE, CELLS, X_SIGN, O_SIGN
+from game_play_state import GamePlayState, GameTurn
+from strategy import Strategy, ComputerStrategyBuilder, LazyStrategy, StrengthStrategy, Difficulty, Winner, FILENAME
+
+EMPTY_SIGN = "-"
+
+
+class ReferenceSolver:
+    """
+    An independent implementation of the original solver, which the optimized ones are compared with.
+    The boards are 9 character strings, the winning lines are checked one by one and the winners are computed
+    by a memoized recursion with the original rules. The allowed moves are the candidates of the original step.
+    """
+    LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6))
+
+    def __init__(self):
+        self.winners: dict[str, Winner] = {}
+        self.allowed: dict[tuple[str, Difficulty], set[int]] = {}
+
+    @staticmethod
+    def on_turn(board: str) -> str:
+        return X_SIGN if board.count(X_SIGN) == board.count(O_SIGN) else O_SIGN
+
+    def gameover(self, board: str) -> Optional[Winner]:
+        """
+        :return: the winner if the game is over (BOTH for a full board), otherwise None.
+        """
+        for sign, winner in ((X_SIGN, Winner.X), (O_SIGN, Winner.O)):
+            if any(all(board[i] == sign for i in line) for line in self.LINES):
+                return winner
+        return Winner.BOTH if EMPTY_SIGN not in board else None
+
+    def children(self, board: str) -> dict[int, str]:
+        sign = self.on_turn(board)
+        return {i: board[:i] + sign + board[i + 1:] for i in range(CELLS) if board[i] == EMPTY_SIGN}
+
+    def winner(self, board: str) -> Winner:
+        if (winner := self.winners.get(board)) is not None:
+            return winner
+        winner = self.gameover(board)
+        if winner is None:
+            winner = self.combine([self.winner(child) for child in self.children(board).values()], self.on_turn(board))
+        self.winners[board] = winner
+        return winner
+
+    @staticmethod
+    def combine(children: list[Winner], on_turn: str) -> Winner:
+        x_wins, o_wins, both = Winner.X in children, Winner.O in children, Winner.BOTH in children
+        if not x_wins and not o_wins:
+            return Winner.BOTH
+        if x_wins and o_wins:
+            return Winner.X if on_turn == X_SIGN else Winner.O
+        if x_wins:
+            return Winner.BOTH if on_turn == O_SIGN and both else Winner.X
+        return Winner.BOTH if on_turn == X_SIGN and both else Winner.O
+
+    def allowed_moves(self, board: str, difficulty: Difficulty) -> set[int]:
+        if (allowed := self.allowed.get((board, difficulty))) is None:
+            allowed = self.allowed[(board, difficulty)] = self.compute_allowed_moves(board, difficulty)
+        return allowed
+
+    def compute_allowed_moves(self, board: str, difficulty: Difficulty) -> set[int]:
+        sign = self.on_turn(board)
+        own, opponent = (Winner.X, Winner.O) if sign == X_SIGN else (Winner.O, Winner.X)
+        by_winner: dict[Winner, set[int]] = {w: set() for w in Winner}
+        for i, child in self.children(board).items():
+            by_winner[self.winner(child)].add(i)
+        if difficulty == Difficulty.HARD:
+            choices = (own, Winner.BOTH, opponent)
+        elif difficulty == Difficulty.MEDIUM:
+            return set(self.children(board))
+        else:
+            choices = (opponent, Winner.BOTH, own)
+        return next((by_winner[w] for w in choices if by_winner[w]), set())
+
+    def positions(self) -> Iterator[str]:
+        """
+        All the positions reachable from the empty board (including the game over positions).
+        """
+        stack, seen = [EMPTY_SIGN * CELLS], {EMPTY_SIGN * CELLS}
+        while stack:
+            board = stack.pop()
+            yield board
+            if self.gameover(board) is None:
+                for child in self.children(board).values():
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append(child)
+
+
+def to_game_board(board: str) -> GamePlayState.GameBoard:
+    game_board = GamePlayState.GameBoard()
+    for i, sign in enumerate(board):
+        if sign != EMPTY_SIGN:
+            game_board.set_sign(i, sign)
+    return game_board
+
+
+class CheckResult(NamedTuple):
+    name: str
+    checked: int
+    failures: list[str]
+    seconds: float
+
+    def __str__(self):
+        status = "ok" if not self.failures else f"FAILED ({len(self.failures)})"
+        lines = [f"{self.name:40} {self.checked:8} checks {self.seconds:6.2f} s  {status}"]
+        lines += [f"    {failure}" for failure in self.failures[:10]]
+        return "\n".join(lines)
+
+
+def check_strategy(name: str, strategy: Strategy, reference: ReferenceSolver, samples: int = 2,
+                   hard_only: bool = False) -> CheckResult:
+    """
+    Compares the Winner of every position (if the strategy can tell it) with the reference,
+    and checks that the steps of the strategy are among the moves the reference allows on every difficulty.
+    The steps are random, so each is sampled a few times.
+    """
+    started = perf_counter()
+    checked = 0
+    failures = []
+    winner_of = getattr(strategy, "winner", None)
+    difficulties = [Difficulty.HARD] if hard_only else list(Difficulty)
+    for board in reference.positions():
+        game_board = to_game_board(board)
+        if winner_of is not None:
+            checked += 1
+            if (winner := winner_of(game_board.key)) != reference.winner(board):
+                failures.append(f"{board}: winner {winner}, expected {reference.winner(board)}")
+        if reference.gameover(board) is not None:
+            continue
+        sign = reference.on_turn(board)
+        for difficulty in difficulties:
+            allowed = reference.allowed_moves(board, difficulty)
+            for _ in range(samples):
+                checked += 1
+                r, c = strategy.step(game_board, sign, difficulty)
+                if r * SIZE + c not in allowed:
+                    failures.append(f"{board}: {difficulty.name} step {(r, c)}, allowed {sorted(allowed)}")
+    return CheckResult(f"strategy {name}", checked, failures, perf_counter() - started)
+
+
+def check_gameover(reference: ReferenceSolver, games: int = 5_000, seed: int = 0) -> CheckResult:
+    """
+    Plays random games (with random undos) and checks GamePlayState.is_gameover after every move and undo
+    against ComputerStrategyBuilder.gameover_state and the reference.
+    """
+    started = perf_counter()
+    rng = random.Random(seed)
+    builder = ComputerStrategyBuilder()
+    checked = 0
+    failures = []
+
+    def check(state: GamePlayState, board: str):
+        nonlocal checked
+        checked += 1
+        expected = reference.gameover(board)
+        gameover = builder.gameover_state(BitBoard(state.board.x, state.board.o))
+        result = state.is_gameover()
+        expected_result = {None: False, Winner.BOTH: True, Winner.X: X_SIGN, Winner.O: O_SIGN}[expected]
+        if gameover.is_gameover != (expected is not None) or (expected and gameover.winner != expected):
+            failures.append(f"{board}: gameover_state {gameover}, expected {expected}")
+        if result != expected_result:
+            failures.append(f"{board}: is_gameover {result!r}, expected {expected_result!r}")
+
+    for _ in range(games):
+        state = GamePlayState(GameTurn.PLAYER)
+        board = EMPTY_SIGN * CELLS
+        history = []
+        while not state.is_gameover():
+            if history and rng.random() < 0.2:
+                state.undo()
+                board = history.pop()
+            else:
+                i = rng.choice([i for i in range(CELLS) if board[i] == EMPTY_SIGN])
+                sign = reference.on_turn(board)
+                state.add_sign_to(divmod(i, SIZE), sign)
+                history.append(board)
+                board = board[:i] + sign + board[i + 1:]
+            check(state, board)
+    return CheckResult("is_gameover vs gameover_state", checked, failures, perf_counter() - started)
+
+
+def load_file_strategy() -> Strategy:
+    strategy = ComputerStrategyBuilder(FILENAME).load()
+    if strategy is None:
+        raise FileNotFoundError(f"{FILENAME} does not exist, build it with python strategy.py")
+    return strategy
+
+
+def create_compact_strategy() -> Strategy:
+    from strategy_graph import CompactGraphStrategy
+    return CompactGraphStrategy.build()
+
+
+# The candidates: (factory, only HARD is checked). The strength 1.0 plays like HARD, it ignores the difficulty.
+CANDIDATES: dict[str, tuple[Callable[[], Strategy], bool]] = {
+    "built": (lambda: ComputerStrategyBuilder(use_symmetry=False).build_strategy(), False),
+    "built-symmetry": (lambda: ComputerStrategyBuilder(use_symmetry=True).build_strategy(), False),
+    "built-parallel": (lambda: ComputerStrategyBuilder(use_symmetry=True).build_strategy(workers=2), False),
+    "file": (load_file_strategy, False),
+    "lazy": (LazyStrategy, False),
+    "compact": (create_compact_strategy, False),
+    "strength": (lambda: StrengthStrategy(ComputerStrategyBuilder(use_symmetry=True).build_strategy(), 1.0), True),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifies the strategies and the game over detection "
+                                                 "against a reference implementation of the original solver.")
+    parser.add_argument("candidates", nargs="*", default=[c for c in CANDIDATES if c != "file"],
+                        help=f"strategies to check (default: all but file), choose from {', '.join(CANDIDATES)}")
+    parser.add_argument("--samples", type=int, default=2, help="steps sampled per position and difficulty")
+    parser.add_argument("--games", type=int, default=5_000, help="random games of the is_gameover check")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = perf_counter()
+    random.seed(args.seed)
+    reference = ReferenceSolver()
+    results = [check_gameover(reference, args.games, args.seed)]
+    print(results[-1])
+    for name in args.candidates:
+        if name not in CANDIDATES:
+            parser.error(f"unknown candidate {name}")
+        factory, hard_only = CANDIDATES[name]
+        results.append(check_strategy(name, factory(), reference, args.samples, hard_only))
+        print(results[-1])
+    failed = sum(bool(r.failures) for r in results)
+    print(f"{len(results) - failed}/{len(results)} checks passed in {perf_counter() - started:.2f} s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()